@@ -5,8 +5,12 @@ __email__ = 'rldot41@gmail.com'
 __version__ = '0.0.0'
 
 from .dropout import DropOut 
+from .history import History
 from .int2binary import Int2Bin 
 from .int2unary import Int2Unary 
+from .misc import Combiner, Repeater, Splitter
 from .random_binomial import RandomBinomial 
+from .rbf import RBF
 from .tile_coding import TileCoder
-from .traces import AccumulatingTrace, ReplacingTrace
\ No newline at end of file
+from .traces import (AccumulatingTrace, ReplacingTrace, 
+                     SparseAccumulatingTrace, SparseReplacingTrace)
\ No newline at end of file
@@ -2,6 +2,8 @@
 Abstract base classes for different kinds of feature.
 """
 import numpy as np 
+from flib.seeding import default_rng, seed_sequence
+from flib.util import indices_to_sparse
 
 
 class Feature:
@@ -10,34 +12,125 @@ class Feature:
 
     Implements various methods common to feature functions, which are generally
     the same across the various features in this library.
+
+    Subclasses implement `apply`, which computes the feature for a single 
+    input (a 1-D array of length `n_input`), and should accept an `out` 
+    keyword argument for storing the result in a preallocated array.
+    Inputs with more dimensions are treated as batches, with the last axis 
+    being the input and the leading axes being batch dimensions; these are 
+    dispatched by `__call__` according to how the subclass handles batches:
+
+    - If `vectorized` is true, `apply` handles batches itself, and is called 
+      with the input as-is.
+    - Otherwise, the batch dimensions are flattened and the resulting 2-D 
+      array is passed to `apply_batch`, which subclasses should override with
+      a native implementation where possible (the default just loops over 
+      the rows), and the output is reshaped to have the same batch 
+      dimensions as the input.
+
+    The dtype of the output is given by `dtype`, which subclasses set to a 
+    compact default for the values they produce (e.g., `uint8` for binary 
+    features), and which can be overridden with the `dtype` keyword argument.
+
+    Random numbers are drawn from the feature's own generator, `rng`, which
+    is seeded by the `random_seed` keyword argument (see `flib.seeding`); 
+    subclasses that construct random components (such as hash functions) 
+    do so in `randomize`, so that `seed` can reseed them later.
     """
+    #: Whether `apply` natively supports inputs with batch dimensions.
+    vectorized = False
+    #: The dtype of the output (`None` if it depends on the input).
+    dtype = None
+
     def __init__(self, n_input, n_output, *args, **kwargs):
         self.n_input = n_input
         self.n_output = n_output
 
-        if 'dtype' in kwargs:
-            self.dtype = kwargs['dtype']
+        if kwargs.get('dtype') is not None:
+            self.dtype = np.dtype(kwargs['dtype'])
 
-        # Get the seed for pseudorandom number generator
-        # This may not be the best way to initialize, but it's consistent
-        random_seed = kwargs.get('random_seed', None)
+        self._set_seed(kwargs.get('random_seed', None))
 
-        if isinstance(random_seed, np.random.RandomState):
-            self.random_seed = random_seed.get_state()
+    def _set_seed(self, random_seed):
+        # Set up the pseudorandom number generator, along with the seed
+        # sequence that independent streams are spawned from (see `seeding`)
+        self.random_seed = random_seed
+        self.seed_sequence = seed_sequence(random_seed)
+        if isinstance(random_seed, np.random.Generator):
+            self.rng = random_seed
         else:
-            self.random_seed = random_seed
-
-        # Set up the pseudorandom number generator
-        self.random_state = np.random.RandomState(self.random_seed)
+            self.rng = default_rng(self.seed_sequence)
 
-    def __call__(self, x):
+    def __call__(self, x, **kwargs):
         if not isinstance(x, np.ndarray):
             x = np.array(x)
 
-        if x.ndim > 1:
-            return np.apply_along_axis(self.apply, axis=1, arr=x)
+        if x.ndim <= 1 or self.vectorized:
+            return self.apply(x, **kwargs)
+        elif x.ndim == 2:
+            return self.apply_batch(x, **kwargs)
         else:
-            return self.apply(x)
+            out = kwargs.get('out')
+            if out is not None:
+                # Flatten the batch dimensions of the output without copying
+                kwargs['out'] = out.view()
+                kwargs['out'].shape = (-1,) + out.shape[x.ndim-1:]
+            ret = self.apply_batch(x.reshape(-1, x.shape[-1]), **kwargs)
+            return ret.reshape(x.shape[:-1] + ret.shape[1:])
+
+    def apply_batch(self, x, out=None):
+        """
+        Compute the feature for each row of the 2-D array `x`, optionally 
+        storing the results in the corresponding rows of `out`.
+
+        This default implementation applies `apply` to each row in turn.
+        """
+        if out is None:
+            return np.apply_along_axis(self.apply, axis=1, arr=x)
+        for row, ret in zip(x, out):
+            ret[...] = self.apply(row)
+        return out
+
+    def spawn(self, n):
+        """
+        Spawn `n` independent seed sequences from the feature's own, e.g., for
+        seeding the random components that the feature constructs.
+        """
+        return self.seed_sequence.spawn(n)
+
+    def randomize(self):
+        """
+        Construct the feature's random components from its seed sequence.
+        Features without random components (other than `rng`) do nothing.
+        """
+
+    def seed(self, random_seed=None):
+        """
+        Reseed the feature, as if it had been constructed with `random_seed`
+        (see `flib.seeding`), regenerating its random components.
+        """
+        self._set_seed(random_seed)
+        self.randomize()
+
+    def workspace(self, name, shape, dtype=np.float64, fill=None):
+        """
+        Return a preallocated array for storing intermediate results.
+
+        Arrays are stored per-feature under `name`, and reused on subsequent 
+        calls with the same shape and dtype (otherwise, a new array is 
+        allocated to replace it), so that features can avoid allocating 
+        memory on every call. 
+        The contents of the array are arbitrary, unless `fill` is given, in 
+        which case newly allocated arrays are filled with (a broadcast of) it.
+        """
+        if '_workspace' not in self.__dict__:
+            self._workspace = {}
+        ret = self._workspace.get(name)
+        if ret is None or ret.shape != shape or ret.dtype != dtype:
+            ret = self._workspace[name] = np.empty(shape, dtype=dtype)
+            if fill is not None:
+                np.copyto(ret, fill)
+        return ret
 
     def __len__(self) -> int:
         return self.n_output
@@ -70,6 +163,73 @@ class FunctionalFeature(Feature):
         if func is not None:
             self.apply = func 
 
+class StatefulFeature(Feature):
+    """
+    Base class for features with state that is updated by each input (such 
+    as traces, histories and moving statistics), so that the output depends 
+    on the inputs seen so far.
+
+    If `n_envs` is given, separate state is kept for each of a batch of 
+    (e.g., vectorized) environments, and each step updates all of them at 
+    once from an input of shape `(n_envs, n_input)`.
+
+    Subclasses implement `apply(x, reset=None, out=None)`, which performs a 
+    single step, and `clear(index)`, which resets the state of the 
+    environments selected by `index` (a boolean mask, or `Ellipsis` for all
+    of them).
+    Calling the feature with a sequence of inputs (i.e., with an extra 
+    leading axis) performs each step in turn via `apply_batch`, and returns
+    the output at each step.
+    """
+    def __init__(self, n_input, n_output, *args, n_envs=None, **kwargs):
+        super().__init__(n_input, n_output, *args, **kwargs)
+        self.n_envs = n_envs
+        #: The shape of the input at each step.
+        self.step_shape = (n_input,) if n_envs is None else (n_envs, n_input)
+
+    def clear(self, index):
+        """Reset the state of the environments selected by `index`."""
+        raise NotImplementedError
+
+    def reset(self, mask=None):
+        """
+        Reset the feature's state.
+
+        Args:
+            mask (np.ndarray, optional): Boolean array of length `n_envs`, 
+                indicating which environments should be reset.
+                If unspecified, the state of every environment is reset.
+        """
+        self.clear(Ellipsis if mask is None else np.asarray(mask, dtype=bool))
+
+    def apply_batch(self, x, out=None):
+        """
+        Perform a step for each of the inputs in the sequence `x` in turn, 
+        returning the output after each step (stored in the corresponding 
+        entries of `out`, if given).
+        """
+        if out is None:
+            out = np.empty((len(x),) + self.step_shape[:-1] + (self.n_output,),
+                           dtype=self.dtype)
+        for step, ret in zip(x, out):
+            self.apply(step, out=ret)
+        return out
+
+    def __call__(self, x, reset=None, out=None):
+        x = np.asarray(x)
+        ndim = len(self.step_shape)
+        if x.ndim == ndim:
+            return self.apply(x, reset=reset, out=out)
+        elif reset is not None:
+            raise ValueError("`reset` can only be given for a single step")
+        elif x.ndim == ndim + 1:
+            return self.apply_batch(x, out=out)
+        elif x.ndim > ndim and self.n_envs is None:
+            # Flatten the leading axes into a single sequence
+            return super().__call__(x, out=out)
+        raise ValueError("Incompatible array with shape", x.shape)
+
+
 class OneToMany(Feature):
     """
     Base class for features which return multi-element arrays from inputs 
@@ -84,15 +244,53 @@ class ManyToOne(Feature):
 
 class BinaryFeature(Feature):
     """
-    Base class for binary valued features.
+    Base class for binary valued features, whose output defaults to `uint8`.
     """
     def __init__(self, n_input, n_output, *args, **kwargs):
-        super().__init__(n_input, n_output)
+        if kwargs.get('dtype') is None:
+            kwargs['dtype'] = np.uint8
+        super().__init__(n_input, n_output, *args, **kwargs)
 
 
 class UnaryFeature(Feature):
     """
-    Base class for unary features (i.e., those with a single nonzero bit).
+    Base class for unary features (i.e., those with a single nonzero bit), 
+    whose output defaults to `uint8`.
     """
     def __init__(self, n_input, n_output, *args, **kwargs):
-        super().__init__(n_input, n_output)
\ No newline at end of file
+        if kwargs.get('dtype') is None:
+            kwargs['dtype'] = np.uint8
+        super().__init__(n_input, n_output, *args, **kwargs)
+
+
+class IndexFeature:
+    """
+    Mixin for features whose output can be described by a fixed number of 
+    active indices per input, e.g., tile coding or one-hot representations.
+
+    Subclasses implement `indices`, which returns the active indices for a 
+    batch of inputs, and define `n_dense`, the length of the equivalent dense
+    representation; this class then provides the sparse output mode.
+    """
+    def indices(self, x):
+        """
+        Return an array of shape `(N, k)`, containing the `k` active indices
+        for each of the `N` inputs in `x`.
+        """
+        raise NotImplementedError
+
+    def sparse(self, x, fmt='csr'):
+        """
+        Compute the features for a batch of inputs as a sparse matrix.
+
+        Args:
+            x: The inputs to compute the features for.
+            fmt (str, optional): The output format, either `'csr'` for a
+                `scipy.sparse.csr_matrix`, `'triple'` for the raw 
+                `(indptr, indices, data)` arrays, or `'dense'` for a dense
+                array of shape `(N, n_dense)`.
+
+        Returns:
+            The features for each input, with one row per input.
+        """
+        return indices_to_sparse(self.indices(x), self.n_dense, fmt=fmt)
@@ -2,23 +2,109 @@
 Implementing general "DropOut" style functions, for regularizing or sparsifying
 features stochastically.
 """
-import numpy as np 
-from flib.abstract import Feature 
+import numpy as np
+from flib.abstract import Feature
+from flib.util import triple_to_sparse
 
 
 class DropOut(Feature):
     """
-    A simple dropout implementation. Given an array, returns an array of the 
+    A simple dropout implementation. Given an array, returns an array of the
     same size and shape with its entries either unchanged or set to zero with
-    probability `p`. 
+    probability `p`.
+
+    Batches of inputs are handled a block of rows at a time, by drawing a 
+    mask of the same shape as the block.
+    The input can be modified in-place by passing it as `out`, and when an
+    output array is supplied, no memory is allocated (the random numbers for
+    the mask are drawn into reusable, block-sized workspaces).
+
+    Sparse inputs, given as the active indices of a binary feature of length
+    `n_input` (such as the output of a tile coder), can be handled via `drop`
+    and `sparse`, at a cost proportional to the number of active indices.
+
+    Args:
+        n_input (int): The length of the inputs.
+        p (float): The probability of dropping each entry.
+        random_seed (int, seq, np.random.SeedSequence or np.random.Generator,
+            optional): Seed for the random number generator used to draw 
+            the masks (see `flib.seeding`).
     """
-    def __init__(self, n_input, p, **kwargs):
+    vectorized = True
+    #: The (approximate) number of entries for which the mask is drawn at once.
+    block_size = 2**13
+
+    def __init__(self, n_input, p, random_seed=None, **kwargs):
         if not 0 <= p <= 1:
             raise ValueError("Invalid value for `p`:", p)
-        super().__init__(n_input, n_input, **kwargs)
+        super().__init__(n_input, n_input, random_seed=random_seed, **kwargs)
         self.p = p
 
-    def apply(self, x):
-        ret = x.copy()
-        ret[[np.random.random(size=self.n_input) < self.p]] = 0
-        return ret 
+    def mask(self, shape):
+        """
+        Draw a boolean mask of the given `shape`, which is true for the
+        entries to drop.
+        """
+        return self.rng.random(shape) < self.p
+
+    def apply(self, x, out=None):
+        """
+        Set each entry of `x` to zero with probability `p`, storing the result
+        in `out` if given (which may be `x` itself, to drop entries in-place).
+        """
+        x = np.asarray(x)
+        if out is None:
+            out = x.copy()
+        elif out is not x:
+            np.copyto(out, x)
+        if out.ndim < 2:
+            shape = out.shape
+            blocks = [out]
+        else:
+            rows = max(1, self.block_size // max(out[0].size, 1))
+            shape = (min(rows, len(out)),) + out.shape[1:]
+            blocks = (out[i:i+rows] for i in range(0, len(out), rows))
+        # The random numbers are drawn into workspaces the size of a block
+        draws = self.workspace('draws', shape)
+        mask = self.workspace('mask', shape, bool)
+        for block in blocks:
+            index = slice(len(block)) if block.ndim else Ellipsis
+            self.rng.random(out=draws[index])
+            np.less(draws[index], self.p, out=mask[index])
+            np.copyto(block, 0, where=mask[index])
+        return out
+
+    def drop(self, indices):
+        """
+        Drop each of the active `indices` (a 1-D array) with probability `p`,
+        returning the indices that remain.
+        """
+        indices = np.asarray(indices)
+        return indices[self.rng.random(len(indices)) >= self.p]
+
+    def sparse(self, indices, fmt='csr'):
+        """
+        Drop each of the active `indices` with probability `p`, returning
+        the result as a sparse matrix.
+
+        Args:
+            indices (np.ndarray): Integer array of shape `(N, k)` (or `(k,)`)
+                containing the active indices of each row, all less than
+                `n_input`.
+            fmt (str, optional): The format of the output, one of `'csr'`,
+                `'triple'` or `'dense'` (see `flib.util.indices_to_sparse`).
+
+        Returns:
+            The matrix, of shape `(N, n_input)`, in the requested format.
+        """
+        indices = np.asarray(indices)
+        if indices.ndim == 1:
+            indices = indices[np.newaxis, :]
+        elif indices.ndim != 2:
+            raise ValueError("Incompatible indices with shape", indices.shape)
+        keep = self.rng.random(indices.shape) >= self.p
+        indptr = np.zeros(len(indices) + 1, dtype=np.intp)
+        np.cumsum(np.count_nonzero(keep, axis=1), out=indptr[1:])
+        kept = indices[keep]
+        return triple_to_sparse(indptr, kept, np.ones(len(kept)),
+                                self.n_input, fmt=fmt)
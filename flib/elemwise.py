@@ -1,14 +1,239 @@
 """
-Implementing various elementwise operations, i.e., those that have no effect 
+Implementing various elementwise operations, i.e., those that have no effect
 on the shape of the output.
+
+Each operation is computed with NumPy ufuncs writing directly into the output
+array, so they can be applied in-place (by passing the input as `out`), and
+chains of operations can be fused (see `Fused`) into a single pass over the
+data, one block at a time.
 """
+import numpy as np
+from flib.abstract import Feature
+
+
+class Elementwise(Feature):
+    """
+    Base class for elementwise operations.
+
+    Subclasses implement `compute(x, out)`, which stores the result of the
+    operation on `x` in `out`, and must work when `out` is `x` itself.
+    Operations whose result could overflow the input's dtype (e.g., adding to
+    an array of `uint8`) are computed in the dtype of `out`.
+    By default, the output is an array of `float64` (or the feature's
+    `dtype`, if given).
+    """
+    vectorized = True
+
+    def __init__(self, n_input, **kwargs):
+        super().__init__(n_input, n_input, **kwargs)
+
+    def compute(self, x, out):
+        raise NotImplementedError
+
+    def result_type(self, x):
+        """The dtype of the output for the input `x` (an array or dtype)."""
+        dtype = getattr(self, 'dtype', None)
+        if dtype is None:
+            return np.result_type(x, np.float64)
+        return np.dtype(dtype)
+
+    def apply(self, x, out=None):
+        x = np.asarray(x)
+        if out is None:
+            out = np.empty(x.shape, dtype=self.result_type(x))
+        self.compute(x, out)
+        return out
+
+    def __repr__(self):
+        return '%s(%d)' % (type(self).__name__, self.n_input)
+
+
+class Identity(Elementwise):
+    """The identity function, which copies its input (with the same dtype)."""
+    def result_type(self, x):
+        dtype = getattr(self, 'dtype', None)
+        return np.result_type(x) if dtype is None else np.dtype(dtype)
+
+    def compute(self, x, out):
+        if out is not x:
+            np.copyto(out, x)
+
+
+class Sigmoid(Elementwise):
+    """
+    The logistic function, `1 / (1 + exp(-x))`.
+
+    This is computed as `(1 + tanh(x/2)) / 2`, which doesn't overflow.
+    """
+    def compute(self, x, out):
+        np.multiply(x, 0.5, out=out)
+        np.tanh(out, out=out)
+        np.add(out, 1, out=out)
+        np.multiply(out, 0.5, out=out)
+
+
+class Tanh(Elementwise):
+    """The hyperbolic tangent."""
+    def compute(self, x, out):
+        np.tanh(x, out=out)
+
+
+class Floor(Elementwise):
+    """Round towards negative infinity."""
+    def compute(self, x, out):
+        np.floor(x, out=out)
+
+
+class Ceil(Elementwise):
+    """Round towards positive infinity."""
+    def compute(self, x, out):
+        np.ceil(x, out=out)
+
+
+class Round(Elementwise):
+    """Round to the given number of `decimals` (with ties rounded to even)."""
+    def __init__(self, n_input, decimals=0, **kwargs):
+        super().__init__(n_input, **kwargs)
+        self.decimals = decimals
+
+    def compute(self, x, out):
+        np.round(x, self.decimals, out=out)
+
+
+class NonZero(Elementwise):
+    """Indicator for the nonzero entries of the input."""
+    def compute(self, x, out):
+        np.not_equal(x, 0, out=out)
+
+
+class Cut(Elementwise):
+    """
+    Clip the input to the interval `[low, high]`, where either bound may be
+    `None` (for no bound on that side).
+    """
+    def __init__(self, n_input, low=None, high=None, **kwargs):
+        if low is None and high is None:
+            raise ValueError("At least one of `low` or `high` must be given")
+        super().__init__(n_input, **kwargs)
+        self.low = low
+        self.high = high
+
+    def compute(self, x, out):
+        np.clip(x, self.low, self.high, out=out, dtype=out.dtype, 
+                casting='unsafe')
+
+
+class Add(Elementwise):
+    """Add `value` (a scalar, or an array of length `n_input`) to the input."""
+    def __init__(self, n_input, value, **kwargs):
+        super().__init__(n_input, **kwargs)
+        self.value = value
+
+    def compute(self, x, out):
+        np.add(x, self.value, out=out, dtype=out.dtype, casting='unsafe')
+
+
+class Multiply(Elementwise):
+    """Multiply the input by `value` (a scalar, or array of length `n_input`)."""
+    def __init__(self, n_input, value, **kwargs):
+        super().__init__(n_input, **kwargs)
+        self.value = value
+
+    def compute(self, x, out):
+        np.multiply(x, self.value, out=out, dtype=out.dtype, 
+                    casting='unsafe')
+
+
+class Mask(Elementwise):
+    """
+    Set the entries of the input to zero wherever the boolean array `mask`
+    (of length `n_input`) is false.
+    """
+    def __init__(self, n_input, mask, **kwargs):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != (n_input,):
+            raise ValueError("Mask must have shape", (n_input,))
+        super().__init__(n_input, **kwargs)
+        self.mask = mask
+        self._zero = ~mask
+
+    def result_type(self, x):
+        dtype = getattr(self, 'dtype', None)
+        return np.result_type(x) if dtype is None else np.dtype(dtype)
+
+    def compute(self, x, out):
+        if out is not x:
+            np.copyto(out, x)
+        np.copyto(out, 0, where=self._zero)
+
+
+class Fused(Elementwise):
+    """
+    A chain of elementwise operations, applied in turn.
+
+    Rather than applying each operation to the entire input, the input is
+    split into blocks (of roughly `block_size` elements, along its first
+    axis), and the whole chain is applied to each block in-place, so that
+    each block is only brought into cache once.
+    Each operation's result has the same dtype as it would if the operations
+    were applied separately; intermediate results whose dtype differs from 
+    that of the output are stored in block-sized workspaces.
+
+    Args:
+        *ops (Elementwise): The operations, all with the same `n_input`.
+        block_size (int, optional): The (approximate) number of elements in
+            each block.
+    """
+    def __init__(self, *ops, block_size=2**13, **kwargs):
+        if not ops:
+            raise ValueError("At least one operation is required")
+        n_input = ops[0].n_input
+        if any(op.n_input != n_input for op in ops):
+            raise ValueError("Operations have different input lengths")
+        # Flatten nested chains
+        self.ops = []
+        for op in ops:
+            self.ops.extend(op.ops if isinstance(op, Fused) else [op])
+        self.block_size = block_size
+        super().__init__(n_input, **kwargs)
+
+    def result_types(self, x):
+        """The dtype of each operation's result, for the input `x`."""
+        ret = []
+        dtype = np.result_type(x)
+        for op in self.ops:
+            dtype = op.result_type(dtype)
+            ret.append(dtype)
+        return ret
+
+    def result_type(self, x):
+        dtype = getattr(self, 'dtype', None)
+        if dtype is not None:
+            return np.dtype(dtype)
+        return self.result_types(x)[-1]
+
+    def compute(self, x, out):
+        if out.ndim < 2:
+            rows = None
+            blocks = [(x, out)]
+        else:
+            rows = max(1, self.block_size // max(out[0].size, 1))
+            blocks = ((x[i:i+rows], out[i:i+rows])
+                      for i in range(0, len(out), rows))
+        # Where each operation stores its result (with the last one in `out`)
+        dtypes = self.result_types(x)[:-1]
+        scratch = [None if dtype == out.dtype else 
+                   self.workspace('block_' + dtype.str, 
+                                  out.shape if rows is None else 
+                                  (min(rows, len(out)),) + out.shape[1:],
+                                  dtype)
+                   for dtype in dtypes] + [None]
+        for xb, ob in blocks:
+            src = xb
+            for op, buf in zip(self.ops, scratch):
+                dst = ob if buf is None else buf[:len(ob)]
+                op.compute(src, dst)
+                src = dst
 
-# TODO: Identity
-# TODO: Sigmoid
-# TODO: Tanh
-# TODO: floor, ceiling, round,
-# TODO: nonzero
-# TODO: cut(x, low, high)
-# TODO: multiplication
-# TODO: addition
-# TODO: dropout/zero masking
\ No newline at end of file
+    def __repr__(self):
+        return 'Fused(%s)' % ', '.join(repr(op) for op in self.ops)
@@ -1,5 +1,430 @@
 # -*- coding: utf-8 -*-
+"""
+Composing features into pipelines, i.e., directed acyclic graphs of features.
 
+A pipeline is built from nodes, starting from a `Source` (which represents
+the pipeline's input) and combining them via:
 
-# TODO: Move DAG code here
-# source, concat, juxtapose/tee
\ No newline at end of file
+- `chain(node, *features)`, which applies each feature in turn,
+- `tee(node, *features)`, which applies each feature to the same node,
+- `concat(*nodes)`, which concatenates the outputs of several nodes.
+
+For example:
+
+    src = source(4)
+    tiles = concat(*tee(src, TileCoder(4, 8, 1024), TileCoder(4, 4, 1024)))
+    pipeline = Pipeline(tiles)
+    pipeline(x)
+
+The shape of each node's output is inferred from the features' `n_input` and
+`n_output` when the graph is built. The `Pipeline` then compiles the graph 
+into a flat execution plan, and stores the intermediate results in buffers 
+that are allocated on the first call and reused afterwards.
+Swapping the feature at a node (via `Pipeline.replace`) only re-infers the 
+shapes of, and reallocates the buffers for, that node and its descendants.
+Chains of elementwise features (see `flib.elemwise`) are fused, so that they
+make a single pass over their input rather than each producing their own 
+intermediate result.
+
+Nodes that compute the same thing (the same feature object applied to the 
+same input, or concatenations of the same inputs) are merged when the 
+pipeline is compiled, so shared subexpressions are only evaluated once.
+Each node also remembers its output for the current *step*: a fresh step 
+begins with each call to the pipeline, unless the caller supplies a `step` 
+token, in which case every pipeline built from the same nodes and called 
+with that token reuses the outputs already computed for it.
+This means that stateful features (like traces) advance once per step, no 
+matter how many pipelines or heads consume them, while a new step 
+invalidates every memoized output.
+"""
+import inspect
+import numpy as np 
+from flib.abstract import Feature
+from flib.elemwise import Elementwise, Fused
+
+
+class Node:
+    """
+    Base class for the nodes in a pipeline.
+
+    Each node has some (possibly empty) tuple of input nodes, and produces an
+    array of shape `(N, n_output)` for a batch of `N` inputs to the pipeline.
+    """
+    def __init__(self, *inputs):
+        self.inputs = tuple(inputs)
+        self.n_output = None
+        self.dtype = None
+        self.infer()
+        self.forget()
+
+    def forget(self):
+        """Discard the node's memoized output."""
+        self._step = None
+        self._value = None
+
+    def key(self, args):
+        """
+        A key identifying the node's computation given the positions of its 
+        (merged) inputs, `args`, such that nodes with equal keys produce the 
+        same output.
+        """
+        return (type(self), args)
+
+    def infer(self):
+        """Infer (and validate) the shape and dtype of the node's output."""
+        raise NotImplementedError
+
+    def evaluate(self, args, out=None):
+        """
+        Compute the node's output from the outputs of its inputs, `args`, 
+        optionally storing the result in `out`.
+        """
+        raise NotImplementedError
+
+    @property
+    def supports_out(self):
+        """Whether `evaluate` can store its result in a preallocated array."""
+        return True
+
+    def __len__(self):
+        return self.n_output
+
+    def __repr__(self):
+        return '%s(n_output=%s)' % (type(self).__name__, self.n_output)
+
+
+class Source(Node):
+    """The input to the pipeline, which must have `n_output` columns."""
+    def __init__(self, n_output, dtype=None):
+        super().__init__()
+        self.n_output = n_output
+        self.dtype = dtype
+
+    def infer(self):
+        pass
+
+    def key(self, args):
+        return (type(self), id(self))
+
+    def evaluate(self, args, out=None):
+        return args[0]
+
+    @property
+    def supports_out(self):
+        return False
+
+
+class Apply(Node):
+    """Applies `feature` to the output of the node `input`."""
+    def __init__(self, feature, input):
+        self.feature = feature
+        super().__init__(input)
+
+    def key(self, args):
+        return (type(self), id(self.feature), args)
+
+    def infer(self):
+        input, = self.inputs
+        if getattr(self.feature, 'multiple_outputs', False):
+            raise TypeError("Features with multiple outputs can't be used in "
+                            "a pipeline", self.feature)
+        if input.n_output != self.feature.n_input:
+            raise ValueError("Incompatible feature for input of length", 
+                             input.n_output, self.feature)
+        self.n_output = self.feature.n_output
+        self.dtype = getattr(self.feature, 'dtype', None)
+
+    def evaluate(self, args, out=None):
+        x, = args
+        if out is None:
+            ret = self.feature(x)
+        else:
+            ret = self.feature(x, out=out)
+        return ret
+
+    @property
+    def supports_out(self):
+        return accepts_out(self.feature)
+
+    def __repr__(self):
+        return 'Apply(%r)' % (self.feature,)
+
+
+class Concat(Node):
+    """Concatenates the outputs of the nodes in `inputs`."""
+    def infer(self):
+        if not self.inputs:
+            raise ValueError("Concatenation requires at least one input")
+        self.n_output = sum(i.n_output for i in self.inputs)
+        dtypes = [i.dtype for i in self.inputs]
+        if None in dtypes:
+            self.dtype = None
+        else:
+            self.dtype = np.result_type(*dtypes)
+
+    def evaluate(self, args, out=None):
+        return np.concatenate(args, axis=1, out=out)
+
+
+def accepts_out(feature):
+    """Whether calling `feature` with an `out` keyword argument is supported."""
+    def has_out(func):
+        try:
+            return 'out' in inspect.signature(func).parameters
+        except (TypeError, ValueError):
+            return False
+
+    if not isinstance(feature, Feature):
+        return False
+    if type(feature).__call__ is not Feature.__call__:
+        return has_out(feature.__call__)
+    if not has_out(feature.apply):
+        return False
+    return feature.vectorized or has_out(feature.apply_batch)
+
+
+def source(n_output, dtype=None):
+    """Create the source node for a pipeline with inputs of length `n_output`."""
+    return Source(n_output, dtype=dtype)
+
+
+def chain(node, *features):
+    """Apply each of `features` in turn, starting from `node`."""
+    for feature in features:
+        node = Apply(feature, node)
+    return node
+
+
+def tee(node, *features):
+    """Apply each of `features` to `node`, returning the resulting nodes."""
+    return [Apply(feature, node) for feature in features]
+
+
+def concat(*nodes):
+    """Concatenate the outputs of `nodes`."""
+    return Concat(*nodes)
+
+
+class Pipeline(Feature):
+    """
+    A compiled pipeline of features, computing the output of the node 
+    `output` from the pipeline's (single) source.
+
+    Calling the pipeline evaluates the nodes in topological order, with each 
+    node's output being stored in a buffer that is reused between calls 
+    (for batches of the same size).
+
+    If `random_seed` is given, each of the pipeline's (distinct) features is
+    reseeded with its own child sequence spawned from it, in the order that
+    they're evaluated (see `seed`), so that a single seed determines every
+    feature in the pipeline. Otherwise, the features keep their own seeds.
+
+    .. note::
+        As a consequence, the array returned by the pipeline is overwritten 
+        by subsequent calls, and should be copied if it needs to be kept.
+    """
+    def __init__(self, output, **kwargs):
+        self.output = output
+        self.compile()
+        super().__init__(self.source.n_output, output.n_output, **kwargs)
+        if kwargs.get('random_seed') is not None:
+            self.randomize()
+
+    def compile(self):
+        """
+        Compute the execution plan, a list of `(node, args)` pairs in 
+        topological order, where `args` contains the positions in the plan of
+        the node's inputs.
+
+        Nodes with the same key (see `Node.key`) are merged, with the first 
+        one encountered standing in for the others.
+        """
+        order = []
+        args = []
+        position = {}
+        merged = {}
+        seen = {}
+
+        def visit(node):
+            if id(node) in position:
+                return
+            for i in node.inputs:
+                visit(i)
+            pos = tuple(position[id(i)] for i in node.inputs)
+            key = node.key(pos)
+            if key not in seen:
+                seen[key] = len(order)
+                order.append(node)
+                args.append(pos)
+            position[id(node)] = seen[key]
+            merged.setdefault(seen[key], []).append(node)
+
+        visit(self.output)
+        sources = [node for node in order if isinstance(node, Source)]
+        if len(sources) != 1:
+            raise ValueError("Pipeline must have exactly one source, not", 
+                             len(sources))
+        self.source = sources[0]
+        self.plan = list(zip(order, args))
+        self._position = position
+        self._merged = merged
+        self._buffers = [None] * len(order)
+        self.fuse()
+
+    def fuse(self):
+        """
+        Find the chains of elementwise features in the plan, where each 
+        intermediate result is only used by the next feature in the chain, 
+        which are then evaluated as a single `Fused` feature (writing to the
+        buffer of the chain's last node).
+        """
+        def elementwise(i):
+            node = self.plan[i][0]
+            return isinstance(node, Apply) and isinstance(node.feature, 
+                                                          Elementwise)
+
+        uses = [0] * len(self.plan)
+        uses[-1] += 1
+        for node, args in self.plan:
+            for j in args:
+                uses[j] += 1
+
+        chains = {}
+        self._skip = set()
+        for i, (node, args) in enumerate(self.plan):
+            if not elementwise(i):
+                continue
+            j, = args
+            if elementwise(j) and uses[j] == 1:
+                chains[i] = chains.pop(j, [j]) + [i]
+                self._skip.add(j)
+        self._fusion = {
+            i: (self.plan[chain[0]][1][0], 
+                Fused(*[self.plan[k][0].feature for k in chain]))
+            for i, chain in chains.items()
+        }
+
+    @property
+    def nodes(self):
+        """The nodes of the pipeline, in the order they're evaluated."""
+        return [node for node, args in self.plan]
+
+    @property
+    def features(self):
+        """The distinct features in the pipeline, in the order they're used."""
+        ret = {}
+        for node in self.nodes:
+            if isinstance(node, Apply):
+                ret.setdefault(id(node.feature), node.feature)
+        return list(ret.values())
+
+    def randomize(self):
+        """Reseed each feature with a child of the pipeline's seed sequence."""
+        features = self.features
+        for feature, seed in zip(features, self.spawn(len(features))):
+            if isinstance(feature, Feature):
+                feature.seed(seed)
+
+    def descendants(self, node):
+        """Return the positions in the plan of `node` and its descendants."""
+        start = self._position.get(id(node))
+        if start is None:
+            return set()
+        ret = {start}
+        for i, (n, args) in enumerate(self.plan[start+1:], start+1):
+            if ret.intersection(args):
+                ret.add(i)
+        return ret
+
+    def replace(self, node, feature):
+        """
+        Replace the feature applied at `node` with `feature`, updating the
+        shapes of the node and its descendants, and discarding their buffers.
+        """
+        if not isinstance(node, Apply):
+            raise TypeError("Only `Apply` nodes have features to replace")
+        affected = self.descendants(node)
+        if not affected:
+            raise ValueError("Node is not part of the pipeline:", node)
+        # Nodes merged with `node` (and their descendants) are changed too
+        nodes = self._merged[min(affected)]
+        old = node.feature
+        for n in nodes:
+            n.feature = feature
+        try:
+            for i in sorted(affected):
+                for n in self._merged[i]:
+                    n.infer()
+        except (TypeError, ValueError):
+            # Restore the pipeline to its previous state
+            for n in nodes:
+                n.feature = old
+            for i in sorted(affected):
+                for n in self._merged[i]:
+                    n.infer()
+            raise
+        for i in affected:
+            self._buffers[i] = None
+            self.plan[i][0].forget()
+        self.n_output = self.output.n_output
+        self.fuse()
+
+    def run(self, x, step=None):
+        """
+        Evaluate the pipeline on a batch of inputs `x`, returning a list of 
+        the outputs of every node in the plan (as arrays of shape 
+        `(N, n_output)`).
+
+        Args:
+            x (np.ndarray): The batch of inputs, with shape `(N, n_input)`.
+            step (hashable, optional): Token identifying the current step.
+                Nodes that have already been evaluated for an equal token
+                return their memoized output instead of being recomputed, so
+                the caller must ensure that `x` is the same for each call 
+                with the same token. If `None`, a fresh step is started.
+
+        Returns:
+            list: The output of each node in the plan (or `None` for those 
+            nodes whose evaluation was fused with that of their consumer).
+        """
+        if step is None:
+            step = object()
+        values = [None] * len(self.plan)
+        for i, (node, args) in enumerate(self.plan):
+            if isinstance(node, Source):
+                values[i] = x
+                continue
+            if node._step is not None and node._step == step:
+                values[i] = node._value
+                continue
+            if i in self._skip:
+                continue
+            buf = self._buffers[i]
+            if buf is not None and len(buf) != len(x):
+                buf = None
+            if i in self._fusion:
+                j, fused = self._fusion[i]
+                ret = fused(values[j], out=buf)
+            else:
+                ret = node.evaluate([values[j] for j in args], out=buf)
+            if buf is None and node.supports_out:
+                self._buffers[i] = np.empty_like(ret)
+            values[i] = ret.reshape(len(x), node.n_output)
+            node._step, node._value = step, values[i]
+        return values
+
+    def apply_batch(self, x, out=None, step=None):
+        x = np.asarray(x)
+        if x.ndim != 2 or x.shape[1] != self.n_input:
+            raise ValueError("Incompatible array with shape", x.shape)
+        ret = self.run(x, step=step)[-1]
+        if out is None:
+            return ret
+        out[...] = ret
+        return out
+
+    def apply(self, x, out=None, step=None):
+        if out is not None:
+            out = out[np.newaxis, :]
+        return self.apply_batch(np.asarray(x)[np.newaxis, :], out=out, 
+                                step=step)[0]
@@ -1,4 +1,83 @@
 """
 Implementing histories which represent the past values of other features at
 previous time steps.
-"""
\ No newline at end of file
+"""
+import numpy as np
+from flib.abstract import StatefulFeature
+
+
+class History(StatefulFeature):
+    """
+    The last `length` inputs, e.g., for stacking frames of observations in
+    partially observable environments.
+
+    The inputs are stored in a circular buffer of twice the history's length,
+    with each input being written in two places (`length` rows apart), so
+    that the most recent `length` inputs are always contiguous in the buffer.
+    Each step therefore only costs O(n_input), and the history is returned
+    as a (read-only) view of the buffer, of shape `(length * n_input,)` and
+    ordered from the oldest input to the newest.
+
+    If `n_envs` is given, a separate history is kept for each of a batch of
+    (e.g., vectorized) environments, and each call updates all of them at
+    once from an input of shape `(n_envs, n_input)`.
+
+    Args:
+        n_input (int): The length of the inputs.
+        length (int): The number of inputs to remember.
+        n_envs (int, optional): The number of environments.
+        fill (float, optional): The value of the history before any inputs
+            have been seen (and after it has been reset).
+        dtype (np.dtype, optional): The dtype of the stored inputs.
+    """
+    def __init__(self, n_input, length, n_envs=None, fill=0, dtype=np.float64):
+        if length < 1:
+            raise ValueError("Invalid history length:", length)
+        super().__init__(n_input, n_input * length, n_envs=n_envs, dtype=dtype)
+        self.history_length = length
+        self.fill = fill
+
+        shape = self.step_shape[:-1] + (2*length, n_input)
+        self._buffer = np.full(shape, fill, dtype=dtype)
+        self._index = 0
+
+    def clear(self, index):
+        """Reset the histories selected by `index` to `fill`."""
+        self._buffer[index] = self.fill
+
+    def value(self):
+        """Return a read-only view of the history, without updating it."""
+        k = self.history_length
+        ret = self._buffer[..., self._index:self._index+k, :]
+        ret = ret.reshape(ret.shape[:-2] + (self.n_output,))
+        ret.flags.writeable = False
+        return ret
+
+    def apply(self, x, reset=None, out=None):
+        """
+        Add the input `x` to the history, and return the result.
+
+        Args:
+            x (np.ndarray): The input, of shape `(n_input,)` (or
+                `(n_envs, n_input)` if the history has multiple environments).
+            reset (np.ndarray, optional): Boolean array indicating which
+                environments' histories to reset prior to the update, e.g.,
+                because `x` is the first observation of a new episode.
+            out (np.ndarray, optional): Array to copy the updated history into.
+
+        Returns:
+            np.ndarray: A view of the updated history, or `out` if supplied.
+        """
+        if reset is not None:
+            self.reset(reset)
+        k, i = self.history_length, self._index
+        # The newest input goes at the end of the window starting at `i + 1`
+        np.copyto(self._buffer[..., i, :], x)
+        np.copyto(self._buffer[..., i+k, :], x)
+        self._index = (i + 1) % k
+
+        ret = self.value()
+        if out is None:
+            return ret
+        np.copyto(out, ret)
+        return out
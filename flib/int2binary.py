@@ -3,16 +3,16 @@ Implementation of a feature which maps integers to an array containing
 their binary representation, modulo the length of the array.
 """
 import numpy as np 
-from functools import partial
 from flib.abstract import BinaryFeature
+from flib.util import pack_bits
 
 
 class Int2Bin(BinaryFeature):
     """
     Convert integer to its bit vector representation.
 
-    On initialization, it precomputes an array which is used to extract the 
-    individual bits of each integer. 
+    Arrays of integers (of any shape) are converted all at once, by unpacking
+    the bytes of their (little-endian, two's complement) representation.
 
     .. note ::
         The function only extracts the first `length` bits of the integers 
@@ -20,25 +20,91 @@ class Int2Bin(BinaryFeature):
         For example, `2**length` will have the same representation as `0`, and
         `-1` will be represented the same way as `2**length -1`.
     """
-    def __init__(self, length: int):
-        super().__init__(1, length)
-        # Precompute the array for converting integers to bit vectors
-        self._array = (1 << np.arange(length))
-
-        # Create the function to apply to inputs
-        self.apply = partial(self.func, self._array)
-
-    @staticmethod
-    def func(array, x):
-        return ((x & array) > 0)
-
-    def __call__(self, x):
-        # TODO: Add proper vectorization here / as an abstract mixin
-        x = np.array(x)
-        if x.ndim > 0:
-            ret = np.empty(shape=(x.size, self.n_output), dtype=np.uint8)
-            for ix, i in enumerate(x.flat):
-                ret[ix] = self.apply(i)
-            return ret
-        else:
-            return self.apply(x)
\ No newline at end of file
+    vectorized = True
+    #: The (approximate) number of integers converted at once when writing 
+    #: to `out`, which bounds the size of the workspaces.
+    block_size = 1024
+
+    def __init__(self, length: int, **kwargs):
+        super().__init__(1, length, **kwargs)
+
+    def apply(self, x, out=None):
+        """
+        Convert the integer(s) `x` to bit vectors, optionally storing the 
+        result in `out`, an array of shape `x.shape + (length,)`.
+        """
+        if out is None:
+            return self.bits(x).astype(self.dtype, copy=False)
+        x = np.asarray(x, dtype='<i8')
+        if x.ndim == 0:
+            return self._unpack(x, out, x.shape)
+        # Convert blocks of rows at a time, so the workspaces stay small
+        rows = max(1, self.block_size // max(x[0].size, 1))
+        shape = (min(rows, len(x)),) + x.shape[1:]
+        for i in range(0, len(x), rows):
+            self._unpack(x[i:i+rows], out[i:i+rows], shape)
+        return out
+
+    def _unpack(self, x, out, shape):
+        """Write the bits of `x` to `out`, via workspaces of `shape`."""
+        # Spread the bytes of each integer over the workspace and shift each
+        # bit into place; ufuncs allocate buffers when broadcasting, so all 
+        # the arrays involved have the same shape
+        raw = self.workspace('raw', shape + (8, 8), np.uint8)
+        shifts = self.workspace('shifts', raw.shape, np.uint8, 
+                                fill=np.arange(8, dtype=np.uint8))
+        if x.ndim:
+            raw, shifts = raw[:len(x)], shifts[:len(x)]
+        np.copyto(raw, x[..., np.newaxis].view(np.uint8)[..., np.newaxis])
+        np.right_shift(raw, shifts, out=raw)
+        np.bitwise_and(raw, 1, out=raw)
+
+        bits = raw.reshape(x.shape + (64,))
+        n = min(self.n_output, 64)
+        np.copyto(out[..., :n], bits[..., :n], casting='unsafe')
+        if self.n_output > 64:
+            # Bits beyond the 64th are all equal to the sign bit
+            np.copyto(out[..., 64:], bits[..., 63:], casting='unsafe')
+        return out
+
+    def bits(self, x):
+        """
+        Convert an array of integers to their bit vector representations.
+
+        Args:
+            x (np.ndarray): Array of integers.
+
+        Returns:
+            np.ndarray: Array of `np.uint8` with shape `x.shape + (length,)`
+            (regardless of the feature's `dtype`).
+        """
+        x = np.asarray(x, dtype='<i8')
+        raw = np.unpackbits(x[..., np.newaxis].view(np.uint8), axis=-1, 
+                            bitorder='little')
+        if self.n_output <= 64:
+            return raw[..., :self.n_output]
+        # Bits beyond the 64th are all equal to the sign bit
+        sign = np.broadcast_to(raw[..., -1:], x.shape + (self.n_output - 64,))
+        return np.concatenate([raw, sign], axis=-1)
+
+    def pack(self, x, dtype=np.uint8):
+        """
+        Convert an array of integers to their bit vector representations, 
+        packed into words of type `dtype` (in little-endian order; see 
+        `flib.util.pack_bits`).
+
+        Args:
+            x (np.ndarray): Array of integers.
+            dtype (np.dtype, optional): Unsigned integer type for the words.
+
+        Returns:
+            np.ndarray: Array with shape `x.shape + (n_words,)`.
+        """
+        dtype = np.dtype(dtype)
+        x = np.asarray(x)
+        if dtype == np.uint64 and self.n_output <= 64:
+            # The packed representation is just the integer, modulo `length`
+            mask = np.uint64(2**self.n_output - 1)
+            words = x.astype(np.int64).astype(np.uint64) & mask
+            return words[..., np.newaxis]
+        return pack_bits(self.bits(x), dtype=dtype)
@@ -6,14 +6,49 @@ the supplied integer.
 Can be used to represent the tabular case in terms of arrays, for example.
 """
 import numpy as np
-from flib.abstract import UnaryFeature
+from flib.abstract import IndexFeature, UnaryFeature
 
 
-class Int2Unary(UnaryFeature):
-    def __init__(self, length):
-        self.length = length
-        self._array = np.eye(length)
+class Int2Unary(UnaryFeature, IndexFeature):
+    """
+    Convert integers to one-hot vectors of length `length`.
 
-    def __call__(self, x):
-        # TODO: Implement using the `apply` style, with `__call__` as dispatch
-        return self._array[x]
\ No newline at end of file
+    Ones are scattered directly into the (zeroed) output array, so converting
+    a batch of `N` integers requires `O(N * length)` memory, or `O(N)` when 
+    using the sparse output mode (see `sparse`).
+    """
+    vectorized = True
+
+    def __init__(self, length, **kwargs):
+        super().__init__(1, length, **kwargs)
+
+    def apply(self, x, out=None):
+        """
+        Convert the integer(s) `x` to one-hot vectors.
+
+        Args:
+            x (int or np.ndarray): The integer(s) to convert.
+            out (np.ndarray, optional): Array of shape `x.shape + (length,)` 
+                to store the result in.
+
+        Returns:
+            np.ndarray: The one-hot vectors, with shape `x.shape + (length,)`.
+        """
+        x = np.asarray(x)
+        shape = x.shape + (self.n_output,)
+        if out is None:
+            out = np.zeros(shape, dtype=self.dtype)
+        elif out.shape != shape:
+            raise ValueError("Incompatible output with shape", out.shape)
+        else:
+            out[...] = 0
+        np.put_along_axis(out, x[..., np.newaxis], 1, axis=-1)
+        return out
+
+    @property
+    def n_dense(self):
+        return self.n_output
+
+    def indices(self, x):
+        """Return the active index for each integer in `x`, as a column."""
+        return np.asarray(x).reshape(-1, 1)
@@ -3,17 +3,237 @@ Kanerva coding, also known as sparse distributed representations.
 """
 import numpy as np 
 from functools import partial
-from flib.abstract import FunctionalFeature
+from flib.abstract import Feature, FunctionalFeature
 from flib.norm import hamming_distance
+from flib.util import pack_bits, popcount, triple_to_sparse
 
 
 class Hamming(FunctionalFeature):
     """
     Hamming distance between arrays and a prototype array.
     """
+    vectorized = True
+
     def __init__(self, prototype):
         self.prototype = np.array(prototype)
         super().__init__(len(self.prototype), 1)
 
 
-        self.apply = partial(hamming_distance, self.prototype)
\ No newline at end of file
+        self.apply = partial(hamming_distance, self.prototype, axis=-1)
+
+
+class KanervaCoder(Feature):
+    """
+    Kanerva coding of binary-valued inputs, in which the features are the 
+    prototypes that are closest to the input in terms of Hamming distance.
+
+    Prototypes are either the `k` nearest to the input, or those within 
+    `radius` of it (exactly one of `k` and `radius` must be given).
+
+    The prototypes are stored as a packed bit matrix of `np.uint64` words, 
+    and distances between a batch of inputs and all of the prototypes are 
+    computed via XOR and popcount on the packed words. 
+    The computation is performed in blocks of inputs, such that at most 
+    `block_size` distances are held in memory at a time.
+    """
+    def __init__(self, n_input: int, n_prototypes: int, k=None, radius=None, 
+                 prototypes=None, block_size=2**18, random_seed=None, 
+                 dtype=np.uint8):
+        """
+        Initialize the coder.
+
+        Args:
+            n_input (int): The number of bits in each input.
+            n_prototypes (int): The number of prototypes, which is also the 
+                length of the (dense) output.
+            k (int, optional): The number of nearest prototypes that are 
+                active for each input.
+            radius (int, optional): The maximum Hamming distance at which 
+                prototypes are active.
+            prototypes (np.ndarray, optional): Binary-valued array of shape 
+                `(n_prototypes, n_input)`. If unspecified, the prototypes are
+                drawn uniformly at random.
+            block_size (int, optional): The maximum number of distances to 
+                compute at once.
+            random_seed (int, seq, np.random.SeedSequence, optional): The
+                seed used to generate the prototypes.
+            dtype (np.dtype, optional): The dtype of the (dense) output.
+        """
+        if (k is None) == (radius is None):
+            raise ValueError("Exactly one of `k` and `radius` must be given")
+        if k is not None and not 0 < k <= n_prototypes:
+            raise ValueError("Invalid value for `k`:", k)
+        super().__init__(n_input, n_prototypes, random_seed=random_seed, 
+                         dtype=dtype)
+        self.k = k
+        self.radius = radius
+        self.block_size = block_size
+
+        if n_input < 2**16:
+            self._dist_dtype = np.uint16
+        else:
+            self._dist_dtype = np.uint32
+
+        # Only randomly drawn prototypes are redrawn when reseeding
+        self._random_prototypes = prototypes is None
+        if prototypes is None:
+            self.randomize()
+        else:
+            self.set_prototypes(prototypes)
+
+    def set_prototypes(self, prototypes):
+        """Set the prototypes from an array of shape `(n_prototypes, n_input)`."""
+        prototypes = np.asarray(prototypes)
+        if prototypes.shape != (self.n_output, self.n_input):
+            raise ValueError("Incompatible prototypes with shape", 
+                             prototypes.shape)
+        self.prototypes = pack_bits(prototypes != 0, dtype=np.uint64)
+        # Contiguous columns of the packed prototypes, for faster access
+        self._columns = np.ascontiguousarray(self.prototypes.T)
+
+    def randomize(self):
+        if self._random_prototypes:
+            self.set_prototypes(self.rng.integers(
+                0, 2, size=(self.n_output, self.n_input)))
+
+    def pack(self, x):
+        """Pack binary-valued inputs of shape `(N, n_input)` into words."""
+        x = np.asarray(x)
+        if x.shape[-1] != self.n_input:
+            raise ValueError("Incompatible array with shape", x.shape)
+        return pack_bits(x != 0, dtype=np.uint64)
+
+    def blocks(self, words):
+        """
+        Iterate over blocks of the packed inputs `words`, yielding the start
+        of each block and the distances from its inputs to every prototype.
+
+        .. note::
+            The array of distances is reused between blocks.
+        """
+        step = max(self.block_size // self.n_output, 1)
+        shape = (min(step, len(words)), self.n_output)
+        xor = np.empty(shape, dtype=np.uint64)
+        count = np.empty(shape, dtype=np.uint8)
+        dist = np.empty(shape, dtype=self._dist_dtype)
+        for start in range(0, len(words), step):
+            block = words[start:start+step]
+            n = len(block)
+            dist[:n] = 0
+            for w in range(words.shape[1]):
+                np.bitwise_xor(block[:, w, np.newaxis], self._columns[w], 
+                               out=xor[:n])
+                popcount(xor[:n], out=count[:n])
+                np.add(dist[:n], count[:n], out=dist[:n])
+            yield start, dist[:n]
+
+    def distances(self, x, packed=False):
+        """
+        Compute the Hamming distances between inputs and the prototypes.
+
+        Args:
+            x (np.ndarray): Binary-valued inputs of shape `(N, n_input)`, or 
+                their packed representation (see `pack`) if `packed` is set.
+            packed (bool, optional): Whether `x` has already been packed.
+
+        Returns:
+            np.ndarray: Array of shape `(N, n_prototypes)`.
+        """
+        words = x if packed else self.pack(np.atleast_2d(x))
+        ret = np.empty((len(words), self.n_output), dtype=self._dist_dtype)
+        for start, dist in self.blocks(words):
+            ret[start:start+len(dist)] = dist
+        return ret
+
+    def nearest(self, x, packed=False):
+        """
+        Return the indices of the `k` prototypes nearest to each input, 
+        ordered by distance (with ties broken by index).
+
+        Args:
+            x (np.ndarray): Binary-valued inputs of shape `(N, n_input)`, or 
+                their packed representation (see `pack`) if `packed` is set.
+            packed (bool, optional): Whether `x` has already been packed.
+
+        Returns:
+            np.ndarray: Array of shape `(N, k)`.
+        """
+        words = x if packed else self.pack(np.atleast_2d(x))
+        ret = np.empty((len(words), self.k), dtype=np.int64)
+        n = self.n_output
+        # Partitioning is considerably faster for 32-bit integers
+        dtype = np.int32 if (self.n_input + 1) * n < 2**31 else np.int64
+        index = np.arange(n, dtype=dtype)
+        for start, dist in self.blocks(words):
+            # Break ties by index, by partitioning on `dist * n + index` 
+            # (which is distinct for each prototype) rather than `dist`
+            key = dist.astype(dtype)
+            np.multiply(key, n, out=key)
+            np.add(key, index, out=key)
+            if self.k < n:
+                ix = np.argpartition(key, self.k - 1, axis=1)[:, :self.k]
+            else:
+                ix = np.broadcast_to(index, key.shape)
+            order = np.argsort(np.take_along_axis(key, ix, axis=1), axis=1)
+            ret[start:start+len(dist)] = np.take_along_axis(ix, order, axis=1)
+        return ret
+
+    def within(self, x, radius=None, packed=False):
+        """
+        Find the prototypes within `radius` of each input.
+
+        Args:
+            x (np.ndarray): Binary-valued inputs of shape `(N, n_input)`, or 
+                their packed representation (see `pack`) if `packed` is set.
+            radius (int, optional): The radius; defaults to `self.radius`.
+            packed (bool, optional): Whether `x` has already been packed.
+
+        Returns:
+            tuple: The `(indptr, indices, distances)` arrays, in compressed 
+                sparse row format, where the active prototypes for the `i`-th
+                input are `indices[indptr[i]:indptr[i+1]]`.
+        """
+        if radius is None:
+            radius = self.radius
+        words = x if packed else self.pack(np.atleast_2d(x))
+        counts, indices, distances = [], [], []
+        for start, dist in self.blocks(words):
+            rows, cols = np.nonzero(dist <= radius)
+            counts.append(np.bincount(rows, minlength=len(dist)))
+            indices.append(cols)
+            distances.append(dist[rows, cols])
+        indptr = np.zeros(len(words) + 1, dtype=np.int64)
+        if counts:
+            np.cumsum(np.concatenate(counts), out=indptr[1:])
+            return indptr, np.concatenate(indices), np.concatenate(distances)
+        return (indptr, np.zeros(0, dtype=np.int64), 
+                np.zeros(0, dtype=self._dist_dtype))
+
+    def sparse(self, x, fmt='csr', packed=False):
+        """
+        Compute the (binary) features for a batch of inputs as a sparse 
+        matrix, in the format given by `fmt` (see `flib.util.triple_to_sparse`).
+        Dense matrices have the feature's `dtype`, while the data of sparse 
+        matrices is `float64`.
+        """
+        if self.k is not None:
+            indices = self.nearest(x, packed=packed)
+            indptr = np.arange(len(indices) + 1) * self.k
+            indices = indices.ravel()
+        else:
+            indptr, indices, _ = self.within(x, packed=packed)
+        data = np.ones(len(indices), 
+                       dtype=self.dtype if fmt == 'dense' else np.float64)
+        return triple_to_sparse(indptr, indices, data, self.n_output, fmt=fmt)
+
+    def apply(self, x, out=None):
+        if out is not None:
+            out = out[np.newaxis, :]
+        return self.apply_batch(np.asarray(x)[np.newaxis, :], out=out)[0]
+
+    def apply_batch(self, x, out=None):
+        ret = self.sparse(x, fmt='dense')
+        if out is None:
+            return ret
+        out[...] = ret
+        return out
@@ -1,22 +1,140 @@
 """
-Miscellaneous feature functions, those which have not (yet) been grouped in 
+Miscellaneous feature functions, those which have not (yet) been grouped in
 with similar features in an appropriately named module.
+
+The features here rearrange their inputs rather than computing anything,
+so they avoid copying wherever they can: `Splitter` returns views of its
+input, `Repeater` returns a broadcast view, and `Combiner` has its children
+write their outputs straight into the slices of a single output array.
 """
-import numpy as np 
-from flib.abstract import Feature 
+import numpy as np
+from flib.abstract import Feature
+from flib.flib import accepts_out
 
 
 class Repeater(Feature):
-    """Utility for repeating/duplicating inputs."""
-    # TODO: Settle on a name, implement this accordingly
+    """
+    Utility for repeating/duplicating inputs.
+
+    The input is repeated `n_repeats` times along a new axis, giving an
+    array of shape `x.shape[:-1] + (n_repeats, n_input)`; without `out`, this
+    is a read-only view of the input (with a stride of zero along the new
+    axis), so no memory is used for the copies.
+    When `out` is given, it may have either that shape or the flattened shape
+    `x.shape[:-1] + (n_repeats * n_input,)`.
+    """
+    vectorized = True
+
+    def __init__(self, n_input, n_repeats, **kwargs):
+        super().__init__(n_input, n_input * n_repeats, **kwargs)
+        self.n_repeats = n_repeats
+
+    def apply(self, x, out=None):
+        x = np.asarray(x)
+        ret = np.broadcast_to(x[..., np.newaxis, :],
+                              x.shape[:-1] + (self.n_repeats, x.shape[-1]))
+        if out is None:
+            return ret
+        # Reshape `out` without copying, which raises if it isn't possible
+        view = out.view()
+        view.shape = ret.shape
+        np.copyto(view, ret)
+        return out
 
 
 class Splitter(Feature):
-    """Utility for splitting single vectors into multiple smaller vectors."""
-    # TODO: Settle on a name, implement this accordingly
+    """
+    Utility for splitting single vectors into multiple smaller vectors.
+
+    Since the output is a list of arrays rather than a single array, a 
+    splitter can't be used as a node in a pipeline (see `multiple_outputs`);
+    apply features to slices of the input instead.
+
+    Args:
+        n_input (int): The length of the inputs.
+        sizes (int or list of int): Either the number of equally sized
+            pieces to split the input into, or the length of each piece.
+    """
+    vectorized = True
+    #: The output is a list of arrays, one per piece.
+    multiple_outputs = True
+
+    def __init__(self, n_input, sizes, **kwargs):
+        if np.ndim(sizes) == 0:
+            if n_input % sizes:
+                raise ValueError("Cannot split %d elements into %d pieces" %
+                                 (n_input, sizes))
+            sizes = [n_input // sizes] * sizes
+        if sum(sizes) != n_input:
+            raise ValueError("Sizes must sum to the input length", sizes)
+        super().__init__(n_input, n_input, **kwargs)
+        self.sizes = tuple(sizes)
+        self.bounds = np.cumsum((0,) + self.sizes)
+
+    def apply(self, x):
+        """Split `x` along its last axis, returning a list of views."""
+        x = np.asarray(x)
+        if x.shape[-1] != self.n_input:
+            raise ValueError("Incompatible array with shape", x.shape)
+        return [x[..., a:b] for a, b in zip(self.bounds, self.bounds[1:])]
 
 
 class Combiner(Feature):
-    """Utility for concatenating multiple vectors into a single vector."""
-    # TODO: Settle on a name, implement this accordingly
+    """
+    Utility for concatenating multiple vectors into a single vector.
+
+    Each of `features` is applied to the same input, with its output written
+    directly into its slice of the output array (via its `out` argument,
+    where supported), so that there are no intermediate arrays to
+    concatenate.
+
+    Args:
+        features (list of Feature): The features to combine, which must all
+            have the same `n_input`.
+        dtype (np.dtype, optional): The dtype of the output array, if one
+            is allocated (i.e., `out` is not given); defaults to the common
+            type of the features' dtypes (with `float64` for features whose
+            dtype isn't fixed).
+    """
+    def __init__(self, features, **kwargs):
+        features = list(features)
+        if not features:
+            raise ValueError("Combiner requires at least one feature")
+        n_input = features[0].n_input
+        if any(f.n_input != n_input for f in features):
+            raise ValueError("Features have different input lengths")
+        if kwargs.get('dtype') is None:
+            # Features whose dtype depends on their input produce floats
+            kwargs['dtype'] = np.result_type(*[
+                np.float64 if getattr(f, 'dtype', None) is None else f.dtype
+                for f in features])
+        super().__init__(n_input, sum(f.n_output for f in features), **kwargs)
+        self.features = features
+        self.bounds = np.cumsum([0] + [f.n_output for f in features])
+        self._accepts_out = [accepts_out(f) for f in features]
+        self._expand = {}
+
+    def slices(self, out):
+        """Return the views of `out` that each feature's output is stored in."""
+        return [out[..., a:b] for a, b in zip(self.bounds, self.bounds[1:])]
+
+    def apply_batch(self, x, out=None):
+        if out is None:
+            out = np.empty((len(x), self.n_output), dtype=self.dtype)
+        for i, (f, view) in enumerate(zip(self.features, self.slices(out))):
+            # Features of a single input may treat a batch of shape `(N, 1)`
+            # as `N` scalars, with outputs of shape `(N, 1, n_output)`; 
+            # which shape a feature returns is found from its first output
+            expand = self._expand.get(i)
+            if expand is None or not self._accepts_out[i]:
+                ret = f(x)
+                self._expand[i] = np.ndim(ret) == 3
+                view[...] = np.reshape(ret, view.shape)
+            else:
+                f(x, out=view[:, np.newaxis] if expand else view)
+        return out
 
+    def apply(self, x, out=None):
+        if out is not None:
+            out = out[np.newaxis, :]
+        return self.apply_batch(np.asarray(x)[np.newaxis, :], out=out)[0]
@@ -1,50 +1,142 @@
 """
 Implementing various distance measures, i.e., norms.
+
+The norms accept an `axis` argument, which (as with NumPy's reductions) 
+specifies the axis or axes to reduce over, so that e.g. `l2_norm(x, axis=1)` 
+gives the norm of each row of `x`.
+For distances between every pair of rows in two arrays, see 
+`pairwise_distance`.
 """
 import numpy as np 
 
 
 
-def hamming_distance(a, b):
+def hamming_distance(a, b, axis=None):
     """
     The Hamming distance (a discrete norm between binary-valued arrays).
     """
-    return np.sum(a != b)
+    return np.sum(a != b, axis=axis)
 
 
-def l1_norm(x):
+def l1_norm(x, axis=None):
     """
     The L1-norm, a continuous valued norm.
     """
-    return np.sum(np.abs(x))
+    return np.sum(np.abs(x), axis=axis)
 
 
-def l2_norm(x):
+def l2_norm(x, axis=None):
     """
     The L2-norm, a continuous valued norm.
     """
-    return np.sqrt(np.sum(np.abs(x)**2))
+    return np.sqrt(np.sum(np.abs(x)**2, axis=axis))
 
 
 # TODO: Why is this faster than the built-in `np.linalg.norm`?
-def lp_norm(x, p):
+def lp_norm(x, p, axis=None):
     """
     The general LP-norm, a continuous valued norm.
     """
-    return np.power(np.sum(np.power(np.abs(x), p)), 1/p)
+    return np.power(np.sum(np.power(np.abs(x), p), axis=axis), 1/p)
 
 
 # TODO: Divergence or distance?
-def l1_divergence(a, b):
+def l1_divergence(a, b, axis=None):
     """
     The L1 di, a continuous valued norm between two arrays of the same shape.
     """
-    return np.sum(np.abs(a - b))
+    return np.sum(np.abs(a - b), axis=axis)
 
 
 # TODO: Divergence or distance?
-def l2_divergence(a, b):
+def l2_divergence(a, b, axis=None):
     """
     The L2-norm, a continuous valued norm between two arrays of the same shape.
     """
-    return np.sqrt(np.sum(np.abs(a - b)**2))
\ No newline at end of file
+    return np.sqrt(np.sum(np.abs(a - b)**2, axis=axis))
+
+
+def pairwise_distance(a, b, metric='l2', p=None, squared=False, out=None,
+                      block_size=2**22):
+    """
+    Compute the distance between each row of `a` and each row of `b`, in the 
+    manner of `scipy.spatial.distance.cdist`.
+
+    The distances are computed in blocks of rows of `a`, such that the
+    temporary arrays have at most (roughly) `block_size` entries.
+    For the L2 distance, this uses the identity 
+    `||a - b||^2 = ||a||^2 - 2 a.b + ||b||^2`, so the bulk of the work is a 
+    matrix product; for boolean arrays, the Hamming distance is computed in 
+    the same way.
+
+    Args:
+        a (np.ndarray): Array of shape `(M, D)`.
+        b (np.ndarray): Array of shape `(N, D)`.
+        metric (str, optional): One of `'l1'`, `'l2'`, `'lp'` or `'hamming'`.
+        p (float, optional): The exponent for the `'lp'` metric.
+        squared (bool, optional): For `'l2'`, return the squared distance.
+        out (np.ndarray, optional): Array of shape `(M, N)` for the result.
+        block_size (int, optional): The (approximate) maximum number of 
+            entries in the temporary arrays.
+
+    Returns:
+        np.ndarray: Array of shape `(M, N)` containing the distances.
+    """
+    a = np.atleast_2d(a)
+    b = np.atleast_2d(b)
+    if a.ndim != 2 or b.ndim != 2 or a.shape[1] != b.shape[1]:
+        raise ValueError("Incompatible arrays with shapes", a.shape, b.shape)
+    if metric == 'lp' and p is None:
+        raise ValueError("The 'lp' metric requires a value for `p`")
+
+    if metric == 'hamming':
+        dtype = np.int64
+    else:
+        dtype = np.result_type(a.dtype, b.dtype, np.float64)
+    if out is None:
+        out = np.empty((len(a), len(b)), dtype=dtype)
+    elif out.shape != (len(a), len(b)):
+        raise ValueError("Incompatible output with shape", out.shape)
+
+    if metric == 'l2' or (metric == 'hamming' and a.dtype == b.dtype == bool):
+        # Blocks only need to contain the (M, N) product
+        step = max(block_size // max(len(b), 1), 1)
+        if metric == 'hamming':
+            a = a.astype(np.float64)
+            b = b.astype(np.float64)
+        bb = np.einsum('ij,ij->i', b, b)
+        for start in range(0, len(a), step):
+            block = a[start:start+step]
+            view = out[start:start+step]
+            aa = np.einsum('ij,ij->i', block, block)
+            if (view.flags.c_contiguous and 
+                    block.dtype == b.dtype == view.dtype == np.float64):
+                dist = np.dot(block, b.T, out=view)
+            else:
+                dist = np.dot(block, b.T)
+            dist *= -2
+            dist += aa[:, np.newaxis]
+            dist += bb
+            np.maximum(dist, 0, out=dist)
+            if metric == 'hamming':
+                np.rint(dist, out=dist)
+            elif not squared:
+                np.sqrt(dist, out=dist)
+            if dist is not view:
+                view[...] = dist
+        return out
+
+    # Otherwise, blocks contain the (M, N, D) differences
+    step = max(block_size // max(len(b) * a.shape[1], 1), 1)
+    for start in range(0, len(a), step):
+        block = a[start:start+step, np.newaxis, :]
+        view = out[start:start+step]
+        if metric == 'hamming':
+            np.sum(block != b, axis=-1, out=view)
+        elif metric == 'l1':
+            np.sum(np.abs(block - b), axis=-1, out=view)
+        elif metric == 'lp':
+            view[...] = lp_norm(block - b, p, axis=-1)
+        else:
+            raise ValueError("Invalid value for `metric`:", metric)
+    return out
@@ -6,30 +6,112 @@ That is, the number of nonzero entries is fixed, but which entries are zero and
 which entries are one is chosen randomly.
 """
 import numpy as np 
-from flib.abstract import BinaryFeature
+from collections import OrderedDict
+from flib.abstract import BinaryFeature, IndexFeature
+from flib.util import hash_key, hash_keys, mix64
 
 
-class RandomBinomial(BinaryFeature):
-    def __init__(self, length: int, num_active: int):
-        self.length = length 
+class RandomBinomial(BinaryFeature, IndexFeature):
+    """
+    Map hashable inputs to random binary vectors with `num_active` nonzero 
+    entries.
+
+    The active indices are derived deterministically from a (seeded) hash of
+    the input, so nothing needs to be stored, and the same input always maps 
+    to the same vector.
+    The indices are sampled without replacement using Floyd's algorithm, 
+    which is run for all inputs in a batch at once.
+
+    Lists, arrays and other iterables are treated as batches of keys, except 
+    for strings and tuples, which are treated as single keys (as are 0-d 
+    arrays); arrays of shape `(N, 1)` are treated as batches of `N` keys.
+    Keys that compare equal map to the same vector (see 
+    `flib.util.normalize_key`).
+    The output can be written into a preallocated array via `out`, which is
+    zeroed before the active entries are set.
+
+    Optionally, the indices for the most recently used keys can be kept in an
+    LRU cache of size `cache_size`, which avoids recomputing them for single
+    inputs that recur frequently.
+    """
+    def __init__(self, length: int, num_active: int, random_seed=None, 
+                 cache_size=0, **kwargs):
+        if not 0 <= num_active <= length:
+            raise ValueError("Invalid value for `num_active`:", num_active)
+        super().__init__(1, length, random_seed=random_seed, **kwargs)
         self.num_active = num_active
-        self.mapping = {}
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.randomize()
+
+    def randomize(self):
+        self._seed = self.rng.integers(2**64, dtype=np.uint64)
+        self._cache.clear()
 
-    def generate(self):
-        ret = np.zeros(self.length)
-        ix = np.random.choice(np.arange(self.length), self.num_active, replace=False)
-        ret[ix] = 1
-        return ret 
+    @property
+    def n_dense(self):
+        return self.n_output
 
-    def func(self, x: int) -> np.ndarray:
-        if x in self.mapping:
-            return self.mapping[x]
+    def generate(self, hashed):
+        """
+        Sample the active indices for each of the hashed keys in `hashed`, 
+        returning an array of shape `(len(hashed), num_active)`.
+        """
+        state = mix64(hashed ^ self._seed)
+        ret = np.empty((len(state), self.num_active), dtype=np.int64)
+        start = self.length - self.num_active
+        for i, j in enumerate(range(start, self.length)):
+            # Choose from [0, j], using `j` instead if already chosen
+            state = mix64(state + np.uint64(0x9e3779b97f4a7c15))
+            t = (state % np.uint64(j + 1)).astype(np.int64)
+            chosen = np.any(ret[:, :i] == t[:, np.newaxis], axis=1)
+            ret[:, i] = np.where(chosen, j, t)
+        return ret
+
+    def get_indices(self, x):
+        """Return the active indices associated with `x`."""
+        hashed = hash_key(x)
+        if not self.cache_size:
+            return self.generate(np.array([hashed], dtype=np.uint64))[0]
+        # The cache is keyed by the hash, which is consistent for equal keys
+        if hashed in self._cache:
+            self._cache.move_to_end(hashed)
+            return self._cache[hashed]
+        ret = self.generate(np.array([hashed], dtype=np.uint64))[0]
+        self._cache[hashed] = ret
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return ret
+
+    def func(self, x, out=None) -> np.ndarray:
+        if out is None:
+            out = np.zeros(self.length, dtype=self.dtype)
         else:
-            self.mapping[x] = self.generate()
-            return self.mapping[x]
+            out[...] = 0
+        out[self.get_indices(x)] = 1
+        return out
         
-    def __call__(self, x):
-        if hasattr(x, '__iter__'):
-            return np.array([self.func(i) for i in x])
+    @staticmethod
+    def is_batch(x):
+        """Whether `x` should be treated as a batch of keys."""
+        if isinstance(x, np.ndarray):
+            return x.ndim > 0
+        return hasattr(x, '__iter__') and not isinstance(x, (str, bytes, tuple))
+
+    def __call__(self, x, out=None):
+        if self.is_batch(x):
+            indices = self.indices(x)
+            if out is None:
+                out = np.zeros((len(indices), self.length), dtype=self.dtype)
+            else:
+                out[...] = 0
+            np.put_along_axis(out, indices, 1, axis=1)
+            return out
         else:
-            return self.func(x)
+            return self.func(x, out=out)
+
+    def indices(self, x):
+        """Return the active indices for each key in `x`, one row per key."""
+        if not self.is_batch(x):
+            return self.get_indices(x)[np.newaxis, :]
+        return self.generate(hash_keys(x))
@@ -0,0 +1,117 @@
+"""
+Radial basis function features, which represent inputs in terms of their 
+(Gaussian) similarity to a set of centers.
+"""
+import numpy as np 
+from flib.abstract import Feature
+from flib.norm import pairwise_distance
+from flib.util import triple_to_sparse
+
+
+class RBF(Feature):
+    """
+    Gaussian radial basis functions, where the `i`-th feature is 
+    `exp(-||x - centers[i]||^2 / (2 * widths[i]**2))`.
+
+    Batches of inputs are handled by computing the squared distances to all 
+    of the centers at once (see `flib.norm.pairwise_distance`), in blocks of 
+    at most `block_size` entries.
+
+    If `k` is given, only the `k` largest activations for each input are 
+    kept (the rest are set to zero), and `sparse` can be used to get the 
+    output without materializing the dense array.
+    """
+    def __init__(self, centers, widths=1.0, k=None, block_size=2**22, 
+                 **kwargs):
+        """
+        Initialize the features.
+
+        Args:
+            centers (np.ndarray): Array of shape `(n_output, n_input)`.
+            widths (float or np.ndarray, optional): The width of each of the 
+                radial basis functions, either a scalar or one per center.
+            k (int, optional): The number of activations to keep per input.
+            block_size (int, optional): The maximum number of activations to 
+                compute at once.
+        """
+        centers = np.atleast_2d(np.asarray(centers, dtype=np.float64))
+        n_output, n_input = centers.shape
+        if k is not None and not 0 < k <= n_output:
+            raise ValueError("Invalid value for `k`:", k)
+        if kwargs.get('dtype') is None:
+            kwargs['dtype'] = np.float64
+        super().__init__(n_input, n_output, **kwargs)
+        self.centers = centers
+        self.widths = np.broadcast_to(np.asarray(widths, dtype=np.float64), 
+                                      (n_output,))
+        self.k = k
+        self.block_size = block_size
+        self._coef = -0.5 / self.widths**2
+
+    def blocks(self, x, out=None):
+        """
+        Iterate over blocks of rows of `x`, yielding the start of each block
+        and the (dense) activations for its rows, which are stored in the 
+        corresponding rows of `out` if it is given.
+        """
+        x = np.asarray(x)
+        if x.ndim != 2 or x.shape[1] != self.n_input:
+            raise ValueError("Incompatible array with shape", x.shape)
+        step = max(self.block_size // self.n_output, 1)
+        for start in range(0, len(x), step):
+            view = None if out is None else out[start:start+step]
+            act = pairwise_distance(x[start:start+step], self.centers, 
+                                    squared=True, out=view, 
+                                    block_size=self.block_size)
+            act *= self._coef
+            np.exp(act, out=act)
+            yield start, act
+
+    def top_k(self, act):
+        """Return the indices of the `k` largest entries in each row of `act`."""
+        if self.k == self.n_output:
+            return np.broadcast_to(np.arange(self.n_output), act.shape)
+        return np.argpartition(act, -self.k, axis=1)[:, -self.k:]
+
+    def apply_batch(self, x, out=None):
+        """
+        Compute the features for each row of `x`, an array of shape 
+        `(N, n_input)`, optionally storing the result in `out`.
+        """
+        if out is None:
+            out = np.empty((len(x), self.n_output), dtype=self.dtype)
+        if self.k is None:
+            for start, act in self.blocks(x, out=out):
+                pass
+            return out
+        for start, act in self.blocks(x):
+            view = out[start:start+len(act)]
+            ix = self.top_k(act)
+            view[...] = 0
+            np.put_along_axis(view, ix, np.take_along_axis(act, ix, axis=1), 
+                              axis=1)
+        return out
+
+    def apply(self, x, out=None):
+        if out is not None:
+            out = out[np.newaxis, :]
+        return self.apply_batch(np.asarray(x)[np.newaxis, :], out=out)[0]
+
+    def sparse(self, x, fmt='csr'):
+        """
+        Compute the features for a batch of inputs as a sparse matrix with 
+        `k` entries per row, in the format given by `fmt` (see 
+        `flib.util.triple_to_sparse`).
+        """
+        if self.k is None:
+            raise ValueError("Sparse output requires `k` to be specified")
+        x = np.atleast_2d(x)
+        indices = np.empty((len(x), self.k), dtype=np.int64)
+        data = np.empty((len(x), self.k))
+        for start, act in self.blocks(x):
+            ix = self.top_k(act)
+            indices[start:start+len(act)] = ix
+            data[start:start+len(act)] = np.take_along_axis(act, ix, axis=1)
+        indptr = np.arange(len(x) + 1) * self.k
+        return triple_to_sparse(indptr, indices.ravel(), data.ravel(), 
+                                self.n_output, fmt=fmt)
@@ -3,7 +3,7 @@ Code that was written but that was replaced or became obsolete, and is on its
 way to removal, but is stored here in case it becomes relevant again.
 """
 import numpy as np 
-from fractions import gcd 
+from math import gcd 
 
 def sieve(n: int):
     """
@@ -0,0 +1,81 @@
+"""
+Seeding the pseudorandom number generators used by features.
+
+Every feature has its own `np.random.Generator` (as `rng`), created from a
+`np.random.SeedSequence` (as `seed_sequence`), which is built from the
+`random_seed` given to the feature, and which can spawn any number of
+statistically independent child sequences.
+Features that construct random components of their own (such as the hash
+functions of a tile coder) seed them with children spawned from their own
+sequence, so a single seed determines everything about the feature.
+
+To seed all the features in a pipeline from one seed, pass it to the 
+pipeline, which spawns a child sequence for each of its features and 
+reseeds them with it (see `Feature.seed`):
+
+    pipeline = Pipeline(concat(*tee(source(4),
+                                    TileCoder(4, 8, 1024),
+                                    TileCoder(4, 4, 1024))), 
+                        random_seed=1234)
+
+Similarly, to seed the features (or pipelines) in each of several worker 
+processes, spawn a child sequence for each of them:
+
+    seeds = spawn(1234, n_workers)
+
+Spawning is cheap and requires no coordination, and the resulting streams
+don't overlap.
+"""
+import numpy as np
+
+
+def seed_sequence(seed=None):
+    """
+    Convert `seed` to a `np.random.SeedSequence`.
+
+    Args:
+        seed (int, seq, np.random.SeedSequence, np.random.Generator, or
+            np.random.RandomState, optional): The seed; `None` draws fresh
+            entropy from the operating system. For a `Generator`, this is the
+            sequence it was created from, while a (legacy) `RandomState` is
+            used to draw the entropy for a new sequence.
+
+    Returns:
+        np.random.SeedSequence: The seed sequence.
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    elif isinstance(seed, np.random.Generator):
+        # The public `seed_seq` attribute was added in NumPy 1.25
+        bit_generator = seed.bit_generator
+        return getattr(bit_generator, 'seed_seq', None) or \
+            bit_generator._seed_seq
+    elif isinstance(seed, np.random.RandomState):
+        return np.random.SeedSequence(seed.randint(2**32, size=4,
+                                                   dtype=np.uint64))
+    return np.random.SeedSequence(seed)
+
+
+def default_rng(seed=None):
+    """
+    Return a `np.random.Generator` seeded by `seed` (see `seed_sequence`), or
+    `seed` itself if it is already a generator.
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.Generator(np.random.PCG64(seed_sequence(seed)))
+
+
+def spawn(seed, n):
+    """
+    Spawn `n` independent child seed sequences from `seed`.
+
+    Args:
+        seed: The parent seed (see `seed_sequence`). Spawning repeatedly
+            from the same `SeedSequence` produces new children each time.
+        n (int): The number of children to spawn.
+
+    Returns:
+        list: The child `np.random.SeedSequence` objects.
+    """
+    return seed_sequence(seed).spawn(n)
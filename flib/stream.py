@@ -0,0 +1,128 @@
+"""
+Computing features for streams of inputs, i.e., iterables of observations
+that are too large (or arrive too slowly) to be collected into one array.
+
+The stream is grouped into batches of (at most) `batch_size` observations,
+and each batch is passed through the feature (or `Pipeline`) as a 2-D array,
+so that the features' batch implementations can be used without needing to
+hold the whole stream in memory. For example:
+
+    for ret in stream(pipeline, trajectory, batch_size=4096, prefetch=2):
+        ...
+
+Reading the stream can optionally be done on a background thread, which
+keeps up to `prefetch` batches ready while the features are being computed.
+"""
+import itertools
+import queue
+import threading
+import numpy as np
+
+
+def batches(iterable, batch_size, dtype=None):
+    """
+    Group the observations in `iterable` into arrays of `batch_size` rows.
+
+    Args:
+        iterable (iterable): The observations, each of which is a 1-D array
+            (or something that can be converted to one) of the same length,
+            or a scalar (which is treated as an array of length one).
+        batch_size (int): The number of observations per batch; the final
+            batch may be smaller.
+        dtype (np.dtype, optional): The dtype of the batches, which is
+            otherwise inferred from the observations in each batch.
+
+    Yields:
+        np.ndarray: Arrays of shape `(n, n_input)`, with `n <= batch_size`.
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size must be positive", batch_size)
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, batch_size))
+        if not chunk:
+            return
+        yield np.array(chunk, dtype=dtype).reshape(len(chunk), -1)
+
+
+def background(iterable, size):
+    """
+    Iterate over `iterable` on a background thread, keeping up to `size` of
+    its items waiting in a queue.
+
+    Exceptions raised by the iterable are re-raised in the consumer, and the
+    background thread stops (once it has finished fetching the current item)
+    when the returned generator is closed.
+    """
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        # Time out periodically so that the thread notices `stop` being set
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+        else:
+            put((done, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def stream(feature, iterable, batch_size=1024, prefetch=0, flatten=False,
+           dtype=None):
+    """
+    Lazily compute `feature` for each of the observations in `iterable`.
+
+    Args:
+        feature (callable): The feature (or pipeline) to apply to each batch.
+        iterable (iterable): The observations, each of length `n_input`.
+        batch_size (int, optional): The number of observations per batch.
+        prefetch (int, optional): If positive, the stream is read (and
+            batched) on a background thread, with up to `prefetch` batches
+            being held in memory ahead of the one being computed.
+        flatten (bool, optional): Whether to yield the output for each
+            observation, rather than the output for each batch.
+        dtype (np.dtype, optional): The dtype of the input batches.
+
+    Yields:
+        np.ndarray: The output of `feature` for each batch of observations,
+        or for each observation if `flatten` is true.
+
+    .. note::
+        Features that reuse their output buffers (like `Pipeline`) overwrite
+        the previous output when computing the next one, so outputs that
+        need to be kept after advancing the generator should be copied.
+    """
+    source = batches(iterable, batch_size, dtype=dtype)
+    if prefetch > 0:
+        source = background(source, prefetch)
+    for batch in source:
+        ret = feature(batch)
+        if flatten:
+            yield from ret
+        else:
+            yield ret
@@ -7,21 +7,23 @@ to make the tile coder easier to use.
 1. http://incompleteideas.net/rlai.cs.ualberta.ca/RLAI/RLtoolkit/tilesUNHdoc.pdf
 """
 import numpy as np 
-from fractions import gcd 
-from itertools import cycle
-from toolz import take
+from functools import lru_cache
+from flib.abstract import Feature, IndexFeature
+from flib.seeding import default_rng
+from flib.util import index_dtype
 
 
-class TileCoder:
+class TileCoder(Feature, IndexFeature):
     """
     A simple hashed tilecoder, following the documentation for the "UNH CMAC".
 
     .. note::
-        This implementation uses the same randomized hash table for every 
-        coordinate and tiling.
+        By default, this implementation uses the same randomized hash table 
+        for every coordinate and tiling; see `hashing` for alternatives.
     """
     def __init__(self, n_input: int, n_output: int, n_tiles: int, scale=None, 
-                 table_size=2048, random_seed=None):
+                 table_size=2048, random_seed=None, hashing='table', 
+                 asymmetric=False, chunk_size=None, dtype=None):
         """
         Initialize the tile coder.
 
@@ -40,23 +42,33 @@ class TileCoder:
                 prior to tiling.
             table_size (int, optional): The size of the hash table used by the
                 hashing function, `hfunc`.
-            random_seed (int, seq, or np.random.RandomState, optional): The 
+            random_seed (int, seq, np.random.SeedSequence, optional): The 
                 seed used to initialize random number generation used by the 
                 tile coder.
+            hashing (str or Callable, optional): The hashing function to use.
+                Either `'table'` for a single table shared by all tilings, 
+                `'tiled'` for a separate table for each tiling, 
+                `'multiply_shift'` for (table-free) universal hashing, 
+                `'exact'` for collision-free indexing via an `IndexHashTable`
+                (with `n_tiles` entries), or a callable accepting an integer array of shape 
+                `(..., n_output, n_input)` and returning integers of the same
+                shape, such as a `SimpleHash` with `track_load` enabled.
+            asymmetric (bool, optional): Whether to use the asymmetric
+                displacement vector recommended by Miller & Glanz; see
+                `get_displacement`.
+            chunk_size (int, optional): The default number of rows to tile at
+                once when tiling a batch of inputs; see `apply_batch`.
+            dtype (np.dtype, optional): The integer dtype of the returned 
+                indices, which defaults to the smallest unsigned type that 
+                can hold indices up to `n_tiles`.
         """
-
-        self.n_input = n_input
-        self.n_output = n_output
+        if dtype is None:
+            dtype = index_dtype(n_tiles)
+        super().__init__(n_input, n_output, random_seed=random_seed, 
+                         dtype=dtype)
         self.n_tiles = n_tiles
         self.table_size = table_size
-
-        # Get the seed for pseudorandom number generator
-        # This may not be the best way to initialize, but it's consistent
-        if isinstance(random_seed, np.random.RandomState):
-            self.random_seed = random_seed.get_state()
-        else:
-            self.random_seed = random_seed
-        self.random_state = np.random.RandomState(self.random_seed)
+        self.chunk_size = chunk_size
 
         if scale is None:
             self.scale = np.ones(n_input)
@@ -65,13 +77,34 @@ class TileCoder:
             self.scale = np.array(scale)
 
         # Compute displacement vector, and then the offsets for each tiling
-        self.dvec = self.get_displacement(n_input, n_output)
-        self.dmat = np.outer(np.arange(self.n_output), self.dvec)
+        self.dvec = self.get_displacement(n_input, n_output, asymmetric)
+        self.dmat = _offsets(n_input, n_output, asymmetric)
         # Set up the hashing function
-        self.hfunc = SimpleHash(self.table_size, self.n_tiles) 
+        self.hashing = hashing
+        self.randomize()
+
+    def randomize(self):
+        self.hfunc = self.get_hash(self.hashing)
+
+    def get_hash(self, hashing):
+        """Construct the hashing function specified by `hashing`."""
+        if callable(hashing):
+            return hashing
+        seed, = self.spawn(1)
+        if hashing == 'table':
+            return SimpleHash(self.table_size, self.n_tiles, random_seed=seed)
+        elif hashing == 'tiled':
+            return SimpleHash(self.table_size, self.n_tiles, random_seed=seed,
+                              n_tables=self.n_output)
+        elif hashing == 'multiply_shift':
+            return MultiplyShiftHash(self.n_tiles, random_seed=seed)
+        elif hashing == 'exact':
+            return IndexHashTable(self.n_tiles, random_seed=seed)
+        else:
+            raise ValueError("Invalid value for `hashing`:", hashing)
 
 
-    def apply(self, array):
+    def apply(self, array, out=None):
         """
         Map the input array to its tile coding representation.
 
@@ -85,6 +118,8 @@ class TileCoder:
         Args:
             array (np.ndarray): The array to be tiled.
                 Must be of length `n_input`, or else an exception is raised.
+            out (np.ndarray, optional): Integer array of length `n_output` to
+                store the result in.
 
         Returns:
             ret (np.ndarray): An array of length `n_output`, whose entries 
@@ -92,33 +127,132 @@ class TileCoder:
         """
         if len(array) != self.n_input:
             raise ValueError("Incompatible array with length", len(array))
-        x = np.floor_divide(array, self.scale).astype(np.int)
-        v = x - ((x - self.dmat) % self.n_output)
-        a = np.apply_along_axis(self.hfunc, axis=0, arr=v)
-        ret = np.sum(a, axis=1) % self.n_tiles
-        return ret 
+        # Intermediate results are stored in the workspace; the coordinates
+        # are broadcast explicitly, as ufuncs allocate buffers to do so
+        x = self.workspace('x', (self.n_input,), np.int64)
+        np.floor_divide(array, self.scale, out=x, casting='unsafe')
+        xb = self.workspace('xb', self.dmat.shape, np.int64)
+        np.copyto(xb, x)
+        v = self.workspace('v', self.dmat.shape, np.int64)
+        np.subtract(xb, self.dmat, out=v)
+        np.remainder(v, self.n_output, out=v)
+        np.subtract(xb, v, out=v)
+        scratch = (self.workspace('a', v.shape, np.int64), 
+                   self.workspace('tiles', v.shape[:-1], np.int64))
+        return self.get_tiles(v, out=out, scratch=scratch)
 
-    def __call__(self, array):
+    def apply_batch(self, array, chunk_size=None, out=None):
         """
-        Wraps `self.apply`, with slightly different behavior to accomodate
-        multidimensional inputs to allow for tile-coding multiple inputs at
-        the same time.
+        Map each row of a 2-D input array to its tile coding representation.
+
+        This performs the same computation as `apply`, but for all of the rows
+        at once, broadcasting the displacement matrix against the integer 
+        coordinates to get an array of shape `(N, n_output, n_input)`, which 
+        is then hashed and summed over its last axis.
+        The results are identical to calling `apply` on each row in turn.
 
         Args:
-            array (np.ndarray): The input to be tiled
+            array (np.ndarray): The inputs to be tiled, with shape 
+                `(N, n_input)`.
+            chunk_size (int, optional): The maximum number of rows to process
+                at once. Since the intermediate arrays have `n_output` times 
+                as many entries as the input, this can be used to bound the 
+                peak memory usage for large batches.
+                If unspecified, `self.chunk_size` is used, and if that is 
+                also unspecified, all rows are processed at once.
+                When chunking, the arrays for the hashed coordinates are kept
+                in a chunk-sized workspace, and are otherwise temporary.
+            out (np.ndarray, optional): Integer array of shape 
+                `(N, n_output)` to store the result in.
 
         Returns:
-            (np.ndarray): Array whose entries correspond to the indices of the
-                active tiles.
+            ret (np.ndarray): An array of shape `(N, n_output)`, whose rows
+                contain the indices of the active tiles for each input.
         """
-        # Not sure if this is the best way to achieve broadcasting...
-        if array.ndim > 1:
-            return np.apply_along_axis(self.apply, axis=1, arr=array)
+        array = np.asarray(array)
+        if array.ndim != 2 or array.shape[1] != self.n_input:
+            raise ValueError("Incompatible array with shape", array.shape)
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        if chunk_size is None:
+            chunk_size = max(len(array), 1)
+            scratch = None
+        elif chunk_size < 1:
+            raise ValueError("Invalid value for `chunk_size`:", chunk_size)
         else:
-            return self.apply(array)
+            # Reserve space for a whole chunk, and slice it for shorter ones
+            shape = (chunk_size,) + self.dmat.shape
+            scratch = (self.workspace('chunk_a', shape, np.int64), 
+                       self.workspace('chunk_tiles', shape[:-1], np.int64))
+
+        if out is None:
+            out = np.empty((len(array), self.n_output), dtype=self.dtype)
+        for start in range(0, len(array), chunk_size):
+            chunk = array[start:start+chunk_size]
+            x = np.floor_divide(chunk, self.scale).astype(np.int64)
+            x = x[:, np.newaxis, :]
+            v = x - ((x - self.dmat) % self.n_output)
+            if scratch is not None:
+                buffers = tuple(s[:len(chunk)] for s in scratch)
+            else:
+                buffers = None
+            self.get_tiles(v, out=out[start:start+chunk_size], 
+                           scratch=buffers)
+        return out
+
+    def get_tiles(self, v, out=None, scratch=None):
+        """
+        Map the displaced coordinates `v`, an array of shape 
+        `(..., n_output, n_input)`, to the indices of the active tiles, 
+        optionally storing them in `out`.
+
+        For hashing functions, the hashed coordinates are summed modulo 
+        `n_tiles`; an `IndexHashTable` instead maps each tiling's coordinates 
+        to an index directly.
+        The intermediate results are stored in `scratch`, a pair of `int64` 
+        arrays with the shapes of `v` and `v.shape[:-1]` respectively, if 
+        given, and in temporary arrays otherwise.
+        """
+        if isinstance(self.hfunc, IndexHashTable):
+            ret = self.hfunc(v)
+        else:
+            if scratch is None:
+                scratch = (np.empty(v.shape, np.int64), 
+                           np.empty(v.shape[:-1], np.int64))
+            if isinstance(self.hfunc, BaseHash):
+                a = self.hfunc(v, out=scratch[0])
+            else:
+                a = self.hfunc(v)
+            # Sum in 64 bits (directly into `out`, if it's suitable)
+            if out is not None and out.dtype == np.int64:
+                ret = out
+            else:
+                ret = scratch[1]
+            np.sum(a, axis=-1, out=ret)
+            np.remainder(ret, self.n_tiles, out=ret)
+        if out is None:
+            return ret.astype(self.dtype)
+        if ret is not out:
+            np.copyto(out, ret, casting='unsafe')
+        return out
+
+    @property
+    def n_dense(self):
+        """The length of the (dense) binary vector equivalent to the output."""
+        return self.n_tiles
+
+    def indices(self, array):
+        """
+        Return the indices of the active tiles as an array of shape 
+        `(N, n_output)`, treating 1-D inputs as a batch with a single entry.
+        """
+        array = np.asarray(array)
+        if array.ndim == 1:
+            return self.apply(array)[np.newaxis, :]
+        return self.apply_batch(array)
 
     @staticmethod
-    def get_displacement(n_input, n_tilings):
+    def get_displacement(n_input, n_tilings, asymmetric=False):
         """
         Get the displacement vector to use in offsetting the tilings.
 
@@ -128,43 +262,292 @@ class TileCoder:
         `n_input`. If there are fewer such viable numbers, we instead cycle
         through the candidates, ensuring we repeat as seldom as possible.
 
+        Alternatively, with `asymmetric=True`, the displacement vector is 
+        `(1, 3, 5, ..., 2*n_input - 1)`, as recommended by Miller & Glanz[1] 
+        (in which case `n_tilings` should be a power of two, at least 
+        `4*n_input`).
+
+        The results are cached, so the returned array is read-only.
+
         ..note::
             It's recommended by the CMAC people to just increase the number of 
             tilings when there aren't enough candidate values for the 
             displacement vector.
         """
-        viable = [i for i in range(1, n_tilings//2) if gcd(i, n_tilings) == 1]
-        ret = list(take(n_input, cycle(viable)))
-        return np.array(ret)
+        return _displacement(n_input, n_tilings, asymmetric)
+
+
+@lru_cache(maxsize=None)
+def _displacement(n_input, n_tilings, asymmetric):
+    """Compute the (read-only) displacement vector; see `get_displacement`."""
+    if asymmetric:
+        ret = 2 * np.arange(n_input) + 1
+    else:
+        candidates = np.arange(1, max(n_tilings//2, 2))
+        viable = candidates[np.gcd(candidates, n_tilings) == 1]
+        ret = np.resize(viable, n_input)
+    ret.flags.writeable = False
+    return ret
 
-class SimpleHash:
-    def __init__(self, n_entries, high, random_seed=None):
+
+@lru_cache(maxsize=None)
+def _offsets(n_input, n_tilings, asymmetric):
+    """Compute the (read-only) offsets for each tiling, `dmat`."""
+    ret = np.outer(np.arange(n_tilings), _displacement(n_input, n_tilings, 
+                                                       asymmetric))
+    ret.flags.writeable = False
+    return ret
+
+
+class BaseHash:
+    """
+    Base class for the hashing functions used by the tile coder.
+
+    Hashing functions map integer arrays to integers in `[0, high]`, possibly
+    using a separate hash for each of `n_tables` tables, in which case the
+    second-to-last axis of the input indexes the table (e.g., the tilings).
+
+    When `track_load` is set, the number of times each hash value (or slot of 
+    the table) is produced is recorded in `counts`, which can be used to 
+    assess how uniformly the hash is being used.
+    """
+    def __init__(self, n_slots, n_tables=1, random_seed=None, track_load=False):
+        self.n_tables = n_tables
+        self.track_load = track_load
+
+        self.random_seed = random_seed
+        self.rng = default_rng(random_seed)
+
+        if track_load:
+            self.counts = np.zeros((n_tables, n_slots), dtype=np.int64)
+
+    def record(self, slots):
+        """Update the counts of how often each of `slots` has been used."""
+        slots = np.asarray(slots)
+        if self.n_tables > 1:
+            slots = slots + self.counts.shape[1] * self._table_index
+        flat = self.counts.reshape(-1)
+        flat += np.bincount(slots.ravel(), minlength=flat.size)
+
+    def reset_counts(self):
+        """Reset the load counts to zero."""
+        self.counts[...] = 0
+
+    @property
+    def _table_index(self):
+        """Index into the table axis, shaped to broadcast with the inputs."""
+        return np.arange(self.n_tables)[:, np.newaxis]
+
+    @property
+    def load(self):
+        """The fraction of slots that have been used at least once."""
+        return np.count_nonzero(self.counts) / self.counts.size
+
+    @property
+    def max_load(self):
+        """The largest number of times any single slot has been used."""
+        return self.counts.max()
+
+
+class SimpleHash(BaseHash):
+    """
+    Hashing via lookups in a table of random integers.
+
+    With `n_tables > 1` each table is filled independently, so that (for 
+    example) each tiling of the tile coder uses a separate table.
+    """
+    def __init__(self, n_entries, high, random_seed=None, n_tables=1, 
+                 track_load=False):
         """
         Initialize a hash table with `n_entries` total size, and with each 
         entry in the table an integer drawn uniformly at random from (0, high).
+
+        Args:
+            n_entries (int): The size of each table.
+            high (int): The maximum value in the table.
+            random_seed (int, seq, np.random.SeedSequence, optional): The 
+                seed used to generate the table.
+            n_tables (int, optional): The number of independent tables.
+            track_load (bool, optional): Whether to count how many times each
+                entry of the table has been used.
         """
+        super().__init__(n_entries, n_tables, random_seed, track_load)
         self.n_entries = n_entries
         self.high = high
 
-        # Get the seed for pseudorandom number generator
-        # This may not be the best way to initialize, but it's consistent
-        if isinstance(random_seed, np.random.RandomState):
-            self.random_seed = random_seed.get_state()
-        else:
-            self.random_seed = random_seed
-        self.random_state = np.random.RandomState(self.random_seed)
-        
         # Generate the hash table
-        self.table = self.random_state.random_integers(0, high, size=n_entries)
+        if n_tables == 1:
+            size = n_entries
+        else:
+            size = (n_tables, n_entries)
+        self.table = self.rng.integers(0, high + 1, size=size)
 
-    def __call__(self, x):
+    def __call__(self, x, out=None):
         """
         Return the value(s) of the hash table associated with `x`.
 
         Args:
             x (int, Seq[int]): the indices of the table entries to look up.
+                If there are multiple tables, the second-to-last axis must have
+                length `n_tables`.
+            out (np.ndarray, optional): Array to store the result in.
 
         Returns:
             int or Array[int]: the value(s) of the hash table associated with `x`
         """
-        return self.table[x % self.n_entries]
+        if self.track_load:
+            self.record(x % self.n_entries)
+        if self.n_tables == 1:
+            if out is None:
+                return self.table[x % self.n_entries]
+            # Compute the slots in-place to avoid allocating memory
+            slots = np.remainder(x, self.n_entries, out=out)
+            return np.take(self.table, slots, mode='clip', out=out)
+        ret = self.table[self._table_index, x % self.n_entries]
+        if out is None:
+            return ret
+        out[...] = ret
+        return out
+
+
+class MultiplyShiftHash(BaseHash):
+    """
+    Universal hashing via the multiply-shift scheme, which computes the hash
+    arithmetically instead of looking it up in a table.
+
+    For 64-bit integers `x`, this computes `((a*x + b) mod 2**64) >> 32` for
+    a random odd `a` and random `b`, and reduces the result modulo `high + 1`.
+    With `n_tables > 1`, each table uses its own `a` and `b`.
+
+    .. note::
+        The load counts have one entry per possible hash value, i.e., 
+        `high + 1` of them per table.
+    """
+    def __init__(self, high, random_seed=None, n_tables=1, track_load=False):
+        super().__init__(high + 1, n_tables, random_seed, track_load)
+        self.high = high
+
+        # Draw the multipliers (which must be odd) and the offsets
+        shape = (n_tables, 1) if n_tables > 1 else (1,)
+        words = self.rng.integers(0, 2**64, size=(2,) + shape, 
+                                  dtype=np.uint64)
+        self.a = words[0] | np.uint64(1)
+        self.b = words[1]
+
+    def __call__(self, x, out=None):
+        """
+        Return the hash value(s) of `x`.
+
+        Args:
+            x (int, Seq[int]): the integers to hash.
+                If there are multiple tables, the second-to-last axis must have
+                length `n_tables`.
+            out (np.ndarray, optional): Array to store the result in.
+
+        Returns:
+            Array[int]: the hashed value(s), in `[0, high]`.
+        """
+        x = np.asarray(x).astype(np.uint64)
+        h = (self.a * x + self.b) >> np.uint64(32)
+        ret = (h % np.uint64(self.high + 1)).astype(np.int64)
+        if self.track_load:
+            self.record(ret)
+        if out is None:
+            return ret
+        out[...] = ret
+        return out
+
+
+class IndexHashTable:
+    """
+    Collision-free indexing of tile coordinates, following the "index hash 
+    table" of the UNH tile coding software.
+
+    Each distinct set of coordinates (together with the tiling it belongs to)
+    is assigned the next unused index until all `size` indices have been 
+    used, after which new coordinates are hashed into `[0, size)`, and the 
+    number of such overflows is recorded in `overflow_count`.
+
+    Lookups and insertions are performed for a whole batch at once: the keys
+    seen so far are kept sorted (along with their indices), so that the 
+    distinct coordinates in the batch can be looked up with `np.searchsorted`,
+    and the new ones are assigned consecutive indices in a single step.
+    """
+    def __init__(self, size, random_seed=None):
+        """
+        Initialize the table.
+
+        Args:
+            size (int): The number of indices available.
+            random_seed (int, seq, np.random.SeedSequence, optional): The 
+                seed for the hashing function used once the table is full.
+        """
+        self.size = size
+        self.overflow_count = 0
+        self.hfunc = MultiplyShiftHash(size - 1, random_seed=random_seed)
+        # The (sorted) keys that have been assigned indices, and the indices
+        self._keys = None
+        self._ids = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def full(self):
+        """Whether every index has been assigned."""
+        return len(self) >= self.size
+
+    @property
+    def usage(self):
+        """The fraction of indices that have been assigned."""
+        return len(self) / self.size
+
+    def __call__(self, v):
+        """
+        Return the indices associated with the coordinates `v`, assigning new
+        indices to coordinates that have not been seen before.
+
+        Args:
+            v (np.ndarray): Integer array of shape `(..., n_tilings, n_coords)`,
+                where `v[..., i, :]` are the coordinates for the `i`-th tiling.
+
+        Returns:
+            np.ndarray: Integer array of shape `(..., n_tilings)`.
+        """
+        v = np.asarray(v, dtype=np.int64)
+        shape = v.shape[:-1]
+
+        # Prepend the tiling index to the coordinates, and view as bytes
+        tiling = np.broadcast_to(np.arange(shape[-1])[:, np.newaxis], 
+                                 shape + (1,))
+        keys = np.ascontiguousarray(np.concatenate([tiling, v], axis=-1))
+        keys = keys.reshape(-1, keys.shape[-1])
+        raw = keys.view(np.dtype((np.void, keys.itemsize * keys.shape[1])))
+        uniq, first, inverse = np.unique(raw.ravel(), return_index=True, 
+                                         return_inverse=True)
+        if self._keys is None:
+            self._keys = uniq[:0]
+
+        # Look up the keys that have already been assigned indices
+        pos = np.searchsorted(self._keys, uniq)
+        found = np.zeros(len(uniq), dtype=bool)
+        valid = pos < len(self._keys)
+        found[valid] = self._keys[pos[valid]] == uniq[valid]
+        ret = np.empty(len(uniq), dtype=np.int64)
+        ret[found] = self._ids[pos[found]]
+
+        # Assign the next unused indices to as many new keys as possible
+        new = np.flatnonzero(~found)
+        n_assign = min(len(new), self.size - len(self))
+        assign, overflow = new[:n_assign], new[n_assign:]
+        ret[assign] = len(self) + np.arange(n_assign)
+        if n_assign:
+            self._keys = np.insert(self._keys, pos[assign], uniq[assign])
+            self._ids = np.insert(self._ids, pos[assign], ret[assign])
+
+        # Hash the remainder once the table is full
+        if len(overflow):
+            self.overflow_count += len(overflow)
+            hashed = self.hfunc(keys[first[overflow]])
+            ret[overflow] = np.sum(hashed, axis=-1) % self.size
+        return ret[inverse.ravel()].reshape(shape)
@@ -2,34 +2,79 @@
 Implementation of trace-style features
 """
 import numpy as np 
-from flib.abstract import Feature
+from flib.abstract import Feature, StatefulFeature
 
 
-class AccumulatingTrace(Feature):
+class Trace(StatefulFeature):
     """
-    Accumulating traces, which retain a memory of past inputs that decays 
+    Base class for traces, which retain a memory of past inputs that decays
     at a specified rate.
 
-    Given a 1-D binary valued array, the trace first decays according to 
-    `trace *= decay`, and is then incremented by `1` at every index where the
-    input array was nonzero.
+    The trace is updated in-place at each step, first decaying according to
+    `trace *= decay`, after which the subclass's `update` method incorporates
+    the nonzero entries of the input.
+
+    If `n_envs` is given, the trace has shape `(n_envs, n_input)`, holding a 
+    separate trace for each of a batch of (e.g., vectorized) environments, 
+    and each call updates all of them at once from an input of that shape.
     """
-    def __init__(self, n_input, decay):
+    def __init__(self, n_input, decay, n_envs=None):
         if 0 > decay or decay > 1:
             raise ValueError("Invalid decay parameter:", decay)
-        super().__init__(n_input, n_input, dtype=np.float)
+        super().__init__(n_input, n_input, n_envs=n_envs, dtype=np.float64)
         self.decay = decay
-        self._array = np.zeros(n_input, dtype=self.dtype)
 
-        def func(x):
-            self._array *= decay
-            self._array += (x != 0)
+        self._array = np.zeros(self.step_shape, dtype=self.dtype)
+        # Workspace for the nonzero entries of the input
+        self._mask = np.zeros(self.step_shape, dtype=bool)
+
+    def update(self, mask):
+        """Incorporate the (boolean) array of active entries into the trace."""
+        raise NotImplementedError
+
+    def clear(self, index):
+        self._array[index] = 0
+
+    def apply(self, x, reset=None, out=None):
+        """
+        Update the trace from the input `x`, and return the result.
+
+        Args:
+            x (np.ndarray): The input, of the same shape as the trace.
+            reset (np.ndarray, optional): Boolean array indicating which 
+                environments' traces to reset prior to the update, e.g., 
+                because `x` is the first observation of a new episode.
+            out (np.ndarray, optional): Array to copy the updated trace into.
+
+        Returns:
+            np.ndarray: The updated trace, or `out` if it was supplied.
+        """
+        if reset is not None:
+            self.reset(reset)
+        np.multiply(self._array, self.decay, out=self._array)
+        np.not_equal(x, 0, out=self._mask)
+        self.update(self._mask)
+
+        if out is None:
             return self._array
+        np.copyto(out, self._array)
+        return out
 
-        self.apply = func
 
+class AccumulatingTrace(Trace):
+    """
+    Accumulating traces, which retain a memory of past inputs that decays 
+    at a specified rate.
 
-class ReplacingTrace(Feature):
+    Given a 1-D binary valued array, the trace first decays according to 
+    `trace *= decay`, and is then incremented by `1` at every index where the
+    input array was nonzero.
+    """
+    def update(self, mask):
+        np.add(self._array, 1, out=self._array, where=mask)
+
+
+class ReplacingTrace(Trace):
     """
     Replacing traces, which retain a memory of past inputs that decays 
     at a specified rate.
@@ -38,17 +83,142 @@ class ReplacingTrace(Feature):
     `trace *= decay`, and is then set to `1` at every index where the input 
     array was nonzero.
     """
-    def __init__(self, n_input, decay):
+    def update(self, mask):
+        np.putmask(self._array, mask, 1)
+
+
+class SparseTrace(Feature):
+    """
+    Base class for traces of sparse inputs, given as lists of active indices
+    (such as the output of a tile coder), which only do work proportional to
+    the number of active indices at each step.
+
+    Instead of decaying the entire trace at each step, a global scale factor
+    is decayed, and the trace is stored relative to that scale, so that the 
+    value at index `i` is `_values[i] * _scale`.
+    When the scale falls below `min_scale`, the trace is renormalized (to 
+    avoid overflow in the stored values), which is also when entries whose
+    magnitude is below `threshold` are dropped.
+
+    The indices that may be nonzero (the "live" indices) are tracked with a
+    membership bitmap and an array that new indices are appended to, which 
+    is only compacted when the trace is renormalized, so keeping track of 
+    them also costs O(active) per step.
+    """
+    def __init__(self, n_input, decay, threshold=1e-8, min_scale=1e-8):
         if 0 > decay or decay > 1:
             raise ValueError("Invalid decay parameter:", decay)
-        super().__init__(n_input, n_input, dtype=np.float)
+        super().__init__(n_input, n_input, dtype=np.float64)
         self.decay = decay
-        self._array = np.zeros(n_input, dtype=self.dtype)
+        self.threshold = threshold
+        self.min_scale = min_scale
 
-        def func(x):
-            self._array *= decay
-            self._array[np.nonzero(x)] = 1
-            return self._array
+        self._values = np.zeros(n_input, dtype=self.dtype)
+        self._scale = 1.0
+        # Membership of the live indices, and the indices themselves
+        self._is_live = np.zeros(n_input, dtype=bool)
+        self._live = np.zeros(1024, dtype=np.intp)
+        self._n_live = 0
+
+    def increment(self, indices):
+        """Incorporate the (unique) active `indices` into the stored values."""
+        raise NotImplementedError
+
+    def update(self, indices):
+        """
+        Update the trace from the indices of the active entries of the input.
+
+        Args:
+            indices (Seq[int]): The indices of the active entries; repeated 
+                indices are treated as a single active entry.
+        """
+        indices = np.unique(np.asarray(indices, dtype=np.intp))
+        self._scale *= self.decay
+        if self._scale < self.min_scale:
+            self.renormalize()
+        self.increment(indices)
+
+        # Append the indices that weren't already live
+        new = indices[~self._is_live[indices]]
+        self._is_live[new] = True
+        n = self._n_live + len(new)
+        if n > len(self._live):
+            live = np.zeros(max(n, 2*len(self._live)), dtype=np.intp)
+            live[:self._n_live] = self._live[:self._n_live]
+            self._live = live
+        self._live[self._n_live:n] = new
+        self._n_live = n
+
+    def live_indices(self):
+        """
+        Return the indices of the entries of the trace that may be nonzero 
+        (in no particular order), as a view that is only valid until the 
+        next update.
+        """
+        return self._live[:self._n_live]
+
+    def renormalize(self):
+        """
+        Fold the scale factor into the stored values, dropping entries whose
+        magnitude is less than `threshold`.
+        """
+        live = self.live_indices()
+        values = self._values[live] * self._scale
+        drop = np.abs(values) < self.threshold
+        values[drop] = 0
+        self._values[live] = values
+        self._is_live[live[drop]] = False
+        kept = live[~drop]
+        self._live[:len(kept)] = kept
+        self._n_live = len(kept)
+        self._scale = 1.0
+
+    def reset(self):
+        """Reset the trace to zero."""
+        live = self.live_indices()
+        self._values[live] = 0
+        self._is_live[live] = False
+        self._n_live = 0
+        self._scale = 1.0
 
-        self.apply = func
+    def items(self):
+        """Return the indices that may be nonzero, and the trace's values there."""
+        live = self.live_indices().copy()
+        return live, self._values[live] * self._scale
 
+    def value(self, indices):
+        """Return the value of the trace at `indices`."""
+        return self._values[indices] * self._scale
+
+    def todense(self):
+        """Return the entire trace as a dense array (at a cost of O(n_input))."""
+        return self._values * self._scale
+
+    def apply(self, indices):
+        """
+        Update the trace from the active `indices`, returning the (possibly)
+        nonzero indices of the trace and their values; see `items`.
+        """
+        self.update(indices)
+        return self.items()
+
+    def __call__(self, indices):
+        return self.apply(indices)
+
+
+class SparseAccumulatingTrace(SparseTrace):
+    """
+    Accumulating traces for sparse inputs, which decay according to 
+    `trace *= decay` and are then incremented by `1` at each active index.
+    """
+    def increment(self, indices):
+        self._values[indices] += 1 / self._scale
+
+
+class SparseReplacingTrace(SparseTrace):
+    """
+    Replacing traces for sparse inputs, which decay according to 
+    `trace *= decay` and are then set to `1` at each active index.
+    """
+    def increment(self, indices):
+        self._values[indices] = 1 / self._scale
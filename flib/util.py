@@ -2,9 +2,15 @@
 Utilities and small functions used in the rest of flib.
 """
 
+import hashlib
 import numpy as np 
 from functools import wraps 
 
+try:
+    import scipy.sparse
+except ImportError:
+    scipy = None
+
 
 def coerce(f):
     """
@@ -35,3 +41,200 @@ def ensure_shape(func):
     # TODO: Specify which arguments to check
     # TODO: Finish this
 
+
+def indices_to_sparse(indices, n_columns, data=None, fmt='csr'):
+    """
+    Convert an array of active indices into a (sparse) matrix representation.
+
+    Each row of `indices` holds the column indices of the nonzero entries for 
+    the corresponding row of the output, so the whole matrix can be built at
+    once without looping over the rows.
+    Repeated indices within a row are summed, as they would be when computing
+    an inner product with the indices directly.
+
+    Args:
+        indices (np.ndarray): Integer array of shape `(N, k)` (or `(k,)`, for
+            a single row) containing the active indices.
+        n_columns (int): The number of columns of the resulting matrix.
+        data (np.ndarray, optional): The values associated with each index,
+            broadcastable to the shape of `indices`. Defaults to one.
+        fmt (str, optional): The format of the output, one of `'csr'` for a 
+            `scipy.sparse.csr_matrix`, `'triple'` for the raw 
+            `(indptr, indices, data)` arrays that define such a matrix, or 
+            `'dense'` for a dense array of shape `(N, n_columns)`.
+
+    Returns:
+        The matrix, in the requested format.
+    """
+    indices = np.asarray(indices)
+    if indices.ndim == 1:
+        indices = indices[np.newaxis, :]
+    elif indices.ndim != 2:
+        raise ValueError("Incompatible indices with shape", indices.shape)
+    n_rows, n_active = indices.shape
+
+    if data is None:
+        data = np.ones(indices.size)
+    else:
+        data = np.broadcast_to(data, indices.shape).ravel()
+    indptr = np.arange(n_rows + 1) * n_active
+    return triple_to_sparse(indptr, indices.ravel(), data, n_columns, fmt=fmt)
+
+
+def triple_to_sparse(indptr, indices, data, n_columns, fmt='csr'):
+    """
+    Convert the `(indptr, indices, data)` arrays defining a compressed sparse
+    row matrix to the format given by `fmt` (see `indices_to_sparse`).
+    """
+    n_rows = len(indptr) - 1
+    if fmt == 'triple':
+        return indptr, indices, data
+    elif fmt == 'dense':
+        ret = np.zeros((n_rows, n_columns), dtype=np.asarray(data).dtype)
+        rows = np.repeat(np.arange(n_rows), np.diff(indptr))
+        np.add.at(ret, (rows, indices), data)
+        return ret
+    elif fmt == 'csr':
+        if scipy is None:
+            raise ImportError("Sparse matrix output requires `scipy`")
+        return scipy.sparse.csr_matrix((data, indices, indptr), 
+                                       shape=(n_rows, n_columns))
+    else:
+        raise ValueError("Invalid value for `fmt`:", fmt)
+
+
+def index_dtype(n):
+    """
+    Return the smallest unsigned integer dtype that can represent every index
+    in `[0, n)`.
+    """
+    return np.min_scalar_type(max(n - 1, 0))
+
+
+def pack_bits(bits, dtype=np.uint8):
+    """
+    Pack a binary-valued array into words along its last axis.
+
+    Bits are packed in little-endian order, so that bit `j` of word `i` holds
+    the entry at index `i * nbits + j` (where `nbits` is the number of bits in
+    `dtype`). The last word is padded with zeros if necessary.
+
+    Args:
+        bits (np.ndarray): Binary-valued array of shape `(..., length)`.
+        dtype (np.dtype, optional): Unsigned integer type for the words.
+
+    Returns:
+        np.ndarray: Array of shape `(..., ceil(length / nbits))`.
+    """
+    dtype = np.dtype(dtype).newbyteorder('<')
+    packed = np.packbits(bits, axis=-1, bitorder='little')
+    if dtype.itemsize > 1:
+        pad = -packed.shape[-1] % dtype.itemsize
+        if pad:
+            width = [(0, 0)] * (packed.ndim - 1) + [(0, pad)]
+            packed = np.pad(packed, width)
+        packed = np.ascontiguousarray(packed).view(dtype)
+    return packed
+
+
+def unpack_bits(words, length):
+    """
+    Unpack an array of words produced by `pack_bits` into an array of 
+    `length` bits (as `np.uint8`) along its last axis.
+    """
+    words = np.ascontiguousarray(words)
+    words = words.astype(words.dtype.newbyteorder('<'), copy=False)
+    packed = words.view(np.uint8)
+    return np.unpackbits(packed, axis=-1, count=length, bitorder='little')
+
+
+def mix64(x):
+    """
+    Scramble 64-bit unsigned integers using the "SplitMix64" finalizer, which
+    is a bijection on 64-bit integers whose outputs are effectively random.
+
+    Args:
+        x (np.ndarray): Array of `np.uint64`.
+
+    Returns:
+        np.ndarray: Array of `np.uint64` with the same shape as `x`.
+    """
+    x = np.asarray(x, dtype=np.uint64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def normalize_key(key):
+    """
+    Convert `key` to a canonical form, so that keys which compare equal are
+    hashed identically by `hash_key`.
+
+    NumPy scalars and 0-d arrays are converted to the equivalent Python 
+    objects, floats with integral values are converted to integers, and the
+    elements of tuples are normalized in turn.
+    """
+    if isinstance(key, (np.generic, np.ndarray)) and np.ndim(key) == 0:
+        key = key.item()
+    if isinstance(key, float) and key.is_integer():
+        return int(key)
+    if isinstance(key, tuple):
+        return tuple(normalize_key(k) for k in key)
+    return key
+
+
+def hash_key(key) -> int:
+    """
+    Map a hashable key to a 64-bit integer, in a way that is consistent 
+    across runs (unlike the built-in `hash`, which is randomized for strings).
+
+    Keys are first normalized (see `normalize_key`), so that keys which 
+    compare equal (like `1`, `1.0` and `np.float64(1)`) get the same hash.
+    Integers are then mapped to themselves (modulo `2**64`), while other keys
+    are hashed via their `repr`.
+    """
+    key = normalize_key(key)
+    if isinstance(key, int):
+        return int(key) & 0xffffffffffffffff
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def hash_keys(keys):
+    """
+    Map a sequence of hashable keys to an array of 64-bit integers, as per
+    `hash_key`, without looping over the keys when they're integers.
+    Arrays of shape `(N, 1)` (i.e., batches of single inputs) are treated as
+    `N` scalar keys.
+    """
+    if isinstance(keys, np.ndarray):
+        if keys.ndim == 2 and keys.shape[1] == 1:
+            keys = keys[:, 0]
+        if keys.ndim == 1 and keys.dtype.kind in 'iub':
+            return keys.astype(np.int64).astype(np.uint64)
+        keys = keys.tolist()
+    return np.fromiter((hash_key(k) for k in keys), dtype=np.uint64)
+
+
+# Number of set bits in each possible byte, for computing the popcount
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], 
+                           dtype=np.uint8)
+
+
+def popcount(words, out=None):
+    """
+    Count the number of set bits in each entry of an unsigned integer array.
+
+    Args:
+        words (np.ndarray): Array of unsigned integers.
+        out (np.ndarray, optional): Array of `np.uint8` to store the result.
+
+    Returns:
+        np.ndarray: Array of `np.uint8` with the same shape as `words`.
+    """
+    words = np.asarray(words)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words, out=out)
+    counts = _POPCOUNT_TABLE[np.ascontiguousarray(words).view(np.uint8)]
+    counts = counts.reshape(words.shape + (words.dtype.itemsize,))
+    return counts.sum(axis=-1, dtype=np.uint8, out=out)
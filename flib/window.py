@@ -1,3 +1,444 @@
 """
 Implementing various window functions.
-"""
\ No newline at end of file
+
+The window features summarize the last `length` inputs they've seen (sums,
+means, variances, minima and maxima), updating incrementally so that each
+step costs O(n_input) regardless of the length of the window:
+
+- Sums, means and variances keep running sums, which are recomputed from the
+  window's contents once every `length` steps to avoid accumulating error.
+- Minima and maxima split the stream into blocks of `length` inputs, and
+  combine the running extremum of the current block with the suffix extrema
+  of the previous block (computed once, when the block is completed), which
+  amounts to a vectorized version of the two-stack queue.
+
+Calling a window feature with a sequence of inputs (an array with an extra
+leading axis) computes its output at each step with cumulative sums (or
+blockwise extrema), continuing from the feature's current state.
+The same computations are available for offline arrays via `sliding_sum`,
+`sliding_mean`, `sliding_variance`, `sliding_min` and `sliding_max`.
+
+The exponential moving statistics (`ExponentialMean`, `ExponentialVariance`)
+instead weight past inputs by a decay factor, and need no window at all.
+"""
+import numpy as np
+from flib.abstract import StatefulFeature
+
+
+def _counts(n_steps, length, start=0, ndim=1):
+    """
+    The number of inputs in the window at each of `n_steps` steps, starting
+    from a window containing `start` inputs, shaped to broadcast against an
+    array with `ndim` dimensions.
+    """
+    steps = np.arange(1, n_steps + 1).reshape((-1,) + (1,) * (ndim - 1))
+    return np.minimum(start + steps, length)
+
+
+def _window_sum(x, length):
+    """Sums over windows of `length` rows of `x` (along the first axis)."""
+    c = np.cumsum(x, axis=0)
+    ret = c.copy()
+    ret[length:] -= c[:-length]
+    return ret
+
+
+def _window_extremum(x, length, ufunc, identity):
+    """
+    Extrema over windows of `length` rows of `x`, for `ufunc` either
+    `np.minimum` or `np.maximum`, via the van Herk/Gil-Werman algorithm.
+    """
+    n = len(x)
+    # Pad so that the windows for the first rows are filled with `identity`,
+    # and so that the padded array can be split into blocks of `length` rows
+    n_blocks = -(-(n + length - 1) // length)
+    padded = np.full((n_blocks * length,) + x.shape[1:], identity,
+                     dtype=np.result_type(x, identity))
+    padded[length-1:length-1+n] = x
+    blocks = padded.reshape((n_blocks, length) + x.shape[1:])
+
+    # Extrema of each block's prefixes and suffixes
+    prefix = ufunc.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1]
+    suffix = suffix.reshape(padded.shape)
+    # Each window is the suffix of one block and the prefix of the next
+    return ufunc(suffix[:n], prefix[length-1:length-1+n])
+
+
+def sliding_sum(x, length):
+    """
+    Compute the sum over a sliding window along the first axis of `x`.
+
+    Args:
+        x (np.ndarray): Array of shape `(T, ...)`.
+        length (int): The length of the window.
+
+    Returns:
+        np.ndarray: Array of the same shape as `x`, whose `t`-th row is the
+        sum of rows `max(0, t - length + 1)` through `t` of `x`.
+    """
+    return _window_sum(np.asarray(x), length)
+
+
+def sliding_mean(x, length):
+    """Compute the mean over a sliding window along the first axis of `x`."""
+    x = np.asarray(x)
+    return _window_sum(x, length) / _counts(len(x), length, ndim=x.ndim)
+
+
+def sliding_variance(x, length):
+    """
+    Compute the (population) variance over a sliding window along the first
+    axis of `x`.
+    """
+    x = np.asarray(x)
+    n = _counts(len(x), length, ndim=x.ndim)
+    mean = _window_sum(x, length) / n
+    ret = _window_sum(np.square(x), length) / n - np.square(mean)
+    return np.maximum(ret, 0, out=ret)
+
+
+def sliding_min(x, length):
+    """Compute the minimum over a sliding window along the first axis of `x`."""
+    return _window_extremum(np.asarray(x), length, np.minimum, np.inf)
+
+
+def sliding_max(x, length):
+    """Compute the maximum over a sliding window along the first axis of `x`."""
+    return _window_extremum(np.asarray(x), length, np.maximum, -np.inf)
+
+
+class Window(StatefulFeature):
+    """
+    Base class for features which summarize the last `length` inputs.
+
+    The window's contents are kept in a circular buffer, and subclasses
+    maintain their summary incrementally by implementing:
+
+    - `update(x, i)`, which incorporates the input `x`, while the buffer's
+      `i`-th row still holds the input that is leaving the window,
+    - `rebuild()`, which recomputes the summary from the buffer, once it
+      holds a complete window (in chronological order),
+    - `value()`, which returns the summary of the window,
+    - `aggregate(seq, counts)`, which computes the summary of the windows
+      ending at each of the last `len(counts)` inputs in the sequence `seq`
+      (which is preceded by the `length - 1` inputs already in the window),
+      given the number of inputs in each of those windows, `counts`.
+
+    If `n_envs` is given, a separate window is kept for each of a batch of
+    (e.g., vectorized) environments, and each call updates all of them at
+    once from an input of shape `(n_envs, n_input)`.
+    """
+    #: The value of entries in the buffer that don't hold an input.
+    identity = 0.0
+
+    def __init__(self, n_input, length, n_envs=None):
+        if length < 1:
+            raise ValueError("Invalid window length:", length)
+        super().__init__(n_input, n_input, n_envs=n_envs, dtype=np.float64)
+        self.window_length = length
+
+        shape = self.step_shape
+        self._buffer = np.full((length,) + shape, self.identity,
+                               dtype=self.dtype)
+        self._index = 0
+        # The number of inputs in each environment's window
+        self._count = np.zeros(shape[:-1] + (1,), dtype=np.intp)
+        self.setup(shape)
+
+    def setup(self, shape):
+        """Allocate the arrays that hold the summary of the window."""
+        raise NotImplementedError
+
+    def update(self, x, i):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def value(self):
+        raise NotImplementedError
+
+    def aggregate(self, seq, counts):
+        raise NotImplementedError
+
+    def clear(self, index):
+        """Reset the summary for the environments selected by `index`."""
+        raise NotImplementedError
+
+    def reset(self, mask=None):
+        """
+        Empty the window.
+
+        Args:
+            mask (np.ndarray, optional): Boolean array of length `n_envs`,
+                indicating which environments' windows should be emptied.
+                If unspecified, every window is emptied.
+        """
+        index = Ellipsis if mask is None else np.asarray(mask, dtype=bool)
+        self._buffer[:, index] = self.identity
+        self._count[index] = 0
+        self.clear(index)
+
+    def apply(self, x, reset=None, out=None):
+        """
+        Add the input `x` to the window, and return the updated summary.
+
+        Args:
+            x (np.ndarray): The input, of shape `(n_input,)` (or
+                `(n_envs, n_input)` if the window has multiple environments).
+            reset (np.ndarray, optional): Boolean array indicating which
+                environments' windows to empty prior to the update, e.g.,
+                because `x` is the first observation of a new episode.
+            out (np.ndarray, optional): Array to copy the summary into.
+
+        Returns:
+            np.ndarray: The summary of the window, or `out` if supplied.
+        """
+        if reset is not None:
+            self.reset(reset)
+        i = self._index
+        self.update(x, i)
+        np.copyto(self._buffer[i], x)
+        np.add(self._count, 1, out=self._count)
+        np.minimum(self._count, self.window_length, out=self._count)
+
+        self._index = (i + 1) % self.window_length
+        if self._index == 0:
+            self.rebuild()
+
+        if out is None:
+            return self.value()
+        np.copyto(out, self.value())
+        return out
+
+    def apply_batch(self, x, out=None):
+        """
+        Add each of the inputs in the sequence `x` to the window in turn,
+        returning the summary after each step.
+        """
+        x = np.asarray(x, dtype=self.dtype)
+        length = self.window_length
+        # Prepend the inputs (or identities) that are already in the window
+        context = np.roll(self._buffer, -self._index, axis=0)[1:]
+        seq = np.concatenate([context, x])
+        counts = _counts(len(x), length, start=self._count, ndim=x.ndim)
+        ret = self.aggregate(seq, counts)
+
+        # The buffer now holds the last `length` inputs, in order
+        np.copyto(self._buffer, seq[-length:])
+        np.copyto(self._count, counts[-1])
+        self._index = 0
+        self.rebuild()
+
+        if out is None:
+            return ret
+        np.copyto(out, ret)
+        return out
+
+
+class WindowSum(Window):
+    """The sum of the last `length` inputs."""
+    def setup(self, shape):
+        self._sum = np.zeros(shape, dtype=self.dtype)
+
+    def update(self, x, i):
+        np.subtract(self._sum, self._buffer[i], out=self._sum)
+        np.add(self._sum, x, out=self._sum)
+
+    def rebuild(self):
+        np.sum(self._buffer, axis=0, out=self._sum)
+
+    def clear(self, index):
+        self._sum[index] = 0
+
+    def value(self):
+        return self._sum
+
+    def aggregate(self, seq, counts):
+        return _window_sum(seq, self.window_length)[-len(counts):]
+
+
+class WindowMean(WindowSum):
+    """The mean of the last `length` inputs."""
+    def value(self):
+        ret = self.workspace('value', self._sum.shape)
+        return np.divide(self._sum, np.maximum(self._count, 1), out=ret)
+
+    def aggregate(self, seq, counts):
+        return _window_sum(seq, self.window_length)[-len(counts):] / counts
+
+
+class WindowVariance(WindowSum):
+    """The (population) variance of the last `length` inputs."""
+    def setup(self, shape):
+        super().setup(shape)
+        self._sumsq = np.zeros(shape, dtype=self.dtype)
+
+    def update(self, x, i):
+        old = self._buffer[i]
+        sq = self.workspace('square', self._sum.shape)
+        np.multiply(old, old, out=sq)
+        np.subtract(self._sumsq, sq, out=self._sumsq)
+        np.multiply(x, x, out=sq)
+        np.add(self._sumsq, sq, out=self._sumsq)
+        super().update(x, i)
+
+    def rebuild(self):
+        super().rebuild()
+        sq = self.workspace('squares', self._buffer.shape)
+        np.multiply(self._buffer, self._buffer, out=sq)
+        np.sum(sq, axis=0, out=self._sumsq)
+
+    def clear(self, index):
+        super().clear(index)
+        self._sumsq[index] = 0
+
+    def value(self):
+        n = np.maximum(self._count, 1)
+        mean = self.workspace('mean', self._sum.shape)
+        ret = self.workspace('value', self._sum.shape)
+        np.divide(self._sum, n, out=mean)
+        np.divide(self._sumsq, n, out=ret)
+        np.multiply(mean, mean, out=mean)
+        np.subtract(ret, mean, out=ret)
+        return np.maximum(ret, 0, out=ret)
+
+    def aggregate(self, seq, counts):
+        n = len(counts)
+        mean = _window_sum(seq, self.window_length)[-n:] / counts
+        ret = _window_sum(np.square(seq), self.window_length)[-n:] / counts
+        ret -= np.square(mean)
+        return np.maximum(ret, 0, out=ret)
+
+
+class WindowMin(Window):
+    """
+    The (elementwise) minimum of the last `length` inputs.
+
+    The inputs are split into blocks of `length` steps; the window then
+    consists of a suffix of the previous block, whose minima are computed
+    when that block is completed, and the current block so far, whose
+    minimum is updated at each step.
+    """
+    identity = np.inf
+    ufunc = np.minimum
+
+    def setup(self, shape):
+        self._suffix = np.full((self.window_length,) + shape, self.identity,
+                               dtype=self.dtype)
+        self._prefix = np.full(shape, self.identity, dtype=self.dtype)
+
+    def update(self, x, i):
+        self.ufunc(self._prefix, x, out=self._prefix)
+
+    def rebuild(self):
+        self.ufunc.accumulate(self._buffer[::-1], axis=0,
+                              out=self._suffix[::-1])
+        self._prefix[...] = self.identity
+
+    def clear(self, index):
+        self._suffix[:, index] = self.identity
+        self._prefix[index] = self.identity
+
+    def value(self):
+        ret = self.workspace('value', self._prefix.shape)
+        return self.ufunc(self._suffix[self._index], self._prefix, out=ret)
+
+    def aggregate(self, seq, counts):
+        ret = _window_extremum(seq, self.window_length, self.ufunc,
+                               self.identity)
+        return ret[-len(counts):]
+
+
+class WindowMax(WindowMin):
+    """The (elementwise) maximum of the last `length` inputs."""
+    identity = -np.inf
+    ufunc = np.maximum
+
+
+class Exponential(StatefulFeature):
+    """
+    Base class for exponential moving statistics, which weight the input
+    from `k` steps ago by `decay**k`.
+
+    The statistics are computed from exponential moving averages of powers
+    of the input, normalized by the total weight of the inputs seen so far
+    (so that they're unbiased, even shortly after being reset).
+    If `n_envs` is given, separate statistics are kept for each of a batch
+    of environments, as for `Window`.
+    """
+    #: The powers of the input whose moving averages are needed.
+    powers = (1,)
+
+    def __init__(self, n_input, decay, n_envs=None):
+        if 0 > decay or decay >= 1:
+            raise ValueError("Invalid decay parameter:", decay)
+        super().__init__(n_input, n_input, n_envs=n_envs, dtype=np.float64)
+        self.decay = decay
+
+        shape = self.step_shape
+        self._moments = np.zeros((len(self.powers),) + shape, dtype=self.dtype)
+        self._weight = np.zeros(shape[:-1] + (1,), dtype=self.dtype)
+
+    def clear(self, index):
+        self._moments[:, index] = 0
+        self._weight[index] = 0
+
+    def moments(self):
+        """Return the (normalized) moving averages of the powers of the input."""
+        ret = self.workspace('moments', self._moments.shape)
+        return np.divide(self._moments, np.maximum(self._weight, 1e-300),
+                         out=ret)
+
+    def value(self):
+        raise NotImplementedError
+
+    def apply(self, x, reset=None, out=None):
+        """
+        Update the statistics from the input `x`, and return the result.
+
+        Args:
+            x (np.ndarray): The input, of shape `(n_input,)` (or
+                `(n_envs, n_input)` if there are multiple environments).
+            reset (np.ndarray, optional): Boolean array indicating which
+                environments' statistics to reset prior to the update.
+            out (np.ndarray, optional): Array to copy the statistics into.
+
+        Returns:
+            np.ndarray: The updated statistics, or `out` if supplied.
+        """
+        if reset is not None:
+            self.reset(reset)
+        rate = 1 - self.decay
+        term = self.workspace('term', self._moments.shape[1:])
+        for moment, power in zip(self._moments, self.powers):
+            np.power(x, power, out=term)
+            np.multiply(term, rate, out=term)
+            np.multiply(moment, self.decay, out=moment)
+            np.add(moment, term, out=moment)
+        np.multiply(self._weight, self.decay, out=self._weight)
+        np.add(self._weight, rate, out=self._weight)
+
+        if out is None:
+            return self.value()
+        np.copyto(out, self.value())
+        return out
+
+
+class ExponentialMean(Exponential):
+    """Exponential moving average of the inputs."""
+    def value(self):
+        return self.moments()[0]
+
+
+class ExponentialVariance(Exponential):
+    """Exponential moving variance of the inputs."""
+    powers = (1, 2)
+
+    def value(self):
+        mean, square = self.moments()
+        ret = self.workspace('value', mean.shape)
+        np.multiply(mean, mean, out=ret)
+        np.subtract(square, ret, out=ret)
+        return np.maximum(ret, 0, out=ret)
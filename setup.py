@@ -29,7 +29,9 @@ with open('README.md') as readme_file:
 with open('HISTORY.md') as history_file:
     history = history_file.read().replace('.. :changelog:', '')
 
-requirements = []
+requirements = [
+    'numpy>=1.17',
+]
 
 test_requirements = [
     'flake8',
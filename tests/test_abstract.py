@@ -0,0 +1,80 @@
+"""
+Tests for abstract.py
+"""
+
+import pytest
+import numpy as np 
+from flib import Int2Bin, TileCoder
+from flib.abstract import Feature, FunctionalFeature
+
+
+class RowSum(Feature):
+    """Feature without a native batch implementation."""
+    def __init__(self, n_input):
+        super().__init__(n_input, 2)
+        self.calls = 0
+
+    def apply(self, x):
+        self.calls += 1
+        return np.array([x.sum(), x.max()])
+
+
+class BatchRowSum(RowSum):
+    """Feature with a native batch implementation."""
+    def apply_batch(self, x, out=None):
+        self.calls += 1
+        if out is None:
+            out = np.empty((len(x), 2))
+        np.sum(x, axis=1, out=out[:, 0])
+        np.max(x, axis=1, out=out[:, 1])
+        return out
+
+
+@pytest.mark.parametrize('cls', [RowSum, BatchRowSum])
+@pytest.mark.parametrize('shape', [(7,), (5, 7), (2, 3, 7), (2, 1, 3, 7)])
+def test_dispatch(cls, shape):
+    x = np.random.normal(size=shape)
+    f = cls(shape[-1])
+    out = f(x)
+    assert(out.shape == shape[:-1] + (2,))
+    assert(np.allclose(out[..., 0], x.sum(axis=-1)))
+    assert(np.allclose(out[..., 1], x.max(axis=-1)))
+    if cls is BatchRowSum:
+        assert(f.calls == 1)
+
+
+def test_vectorized():
+    f = FunctionalFeature(3, 3, func=np.tanh)
+    f.vectorized = True
+    x = np.random.normal(size=(2, 4, 3))
+    assert(np.allclose(f(x), np.tanh(x)))
+
+    f = Int2Bin(8)
+    x = np.arange(24).reshape(2, 3, 4)
+    assert(f(x).shape == (2, 3, 4, 8))
+
+
+def test_batch_dimensions():
+    f = TileCoder(2, 8, 100)
+    x = np.random.uniform(0, 10, size=(3, 5, 2))
+    out = f(x)
+    assert(out.shape == (3, 5, 8))
+    assert(np.array_equal(out[1, 2], f(x[1, 2])))
+
+
+@pytest.mark.parametrize('cls', [RowSum, BatchRowSum])
+def test_out(cls):
+    x = np.random.normal(size=(2, 3, 7))
+    f = cls(7)
+    out = np.empty((2, 3, 2))
+    f(x, out=out)
+    assert(np.allclose(out, f(x)))
+
+
+def test_workspace():
+    f = RowSum(3)
+    a = f.workspace('a', (4, 3))
+    assert(f.workspace('a', (4, 3)) is a)
+    assert(f.workspace('a', (4, 3), dtype=np.int64) is not a)
+    b = f.workspace('b', (2, 3), fill=np.arange(3))
+    assert(np.array_equal(b, [[0, 1, 2], [0, 1, 2]]))
@@ -0,0 +1,118 @@
+"""
+Tests that features don't allocate memory at every step when supplied with 
+an output array, using `tracemalloc` (which tracks NumPy's allocations).
+"""
+
+import tracemalloc
+import pytest
+import numpy as np 
+from flib import (AccumulatingTrace, DropOut, Int2Bin, Int2Unary, 
+                  ReplacingTrace, TileCoder)
+
+
+# Each of the arrays involved is substantially larger than this
+MAX_ALLOCATED = 4096
+
+
+def allocated(func, steps=100):
+    """Return the peak memory allocated while calling `func` repeatedly."""
+    tracemalloc.start()
+    try:
+        # Warm up (while tracing, which has some overhead of its own), so 
+        # that workspaces are allocated and caches are populated
+        for i in range(50):
+            func()
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        for i in range(steps):
+            func()
+        return tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+
+
+def test_tile_coder():
+    f = TileCoder(32, 64, 10**6)
+    x = np.random.uniform(0, 10, size=32)
+    out = np.empty(64, dtype=np.int64)
+    assert(allocated(lambda: f(x, out=out)) < MAX_ALLOCATED)
+    assert(np.array_equal(out, f(x)))
+
+
+def test_int2bin():
+    f = Int2Bin(64)
+    x = np.random.randint(-2**40, 2**40, size=256)
+    out = np.empty((256, 64), dtype=np.uint8)
+    assert(allocated(lambda: f(x, out=out)) < MAX_ALLOCATED)
+    assert(np.array_equal(out, f(x)))
+
+
+def test_int2unary():
+    f = Int2Unary(10000)
+    out = np.empty(10000)
+    assert(allocated(lambda: f(1234, out=out)) < MAX_ALLOCATED)
+    assert(np.array_equal(out, f(1234)))
+
+
+@pytest.mark.parametrize('cls', [AccumulatingTrace, ReplacingTrace])
+def test_traces(cls):
+    f = cls(10000, 0.9, n_envs=4)
+    x = np.random.binomial(1, 0.1, size=(4, 10000)).astype(float)
+    out = np.empty((4, 10000))
+    assert(allocated(lambda: f(x, out=out)) < MAX_ALLOCATED)
+
+
+def test_fused():
+    from flib.elemwise import Cut, Floor, Fused, Multiply, Sigmoid
+    f = Fused(Cut(64, 0, 10), Multiply(64, 0.37), Floor(64), Sigmoid(64))
+    x = np.random.uniform(-5, 15, size=(1000, 64))
+    out = np.empty_like(x)
+    assert(allocated(lambda: f(x, out=out)) < MAX_ALLOCATED)
+    assert(np.array_equal(out, f(x)))
+
+
+def test_dropout():
+    f = DropOut(1000, 0.3)
+    x = np.random.uniform(1, 2, size=(64, 1000))
+    out = np.empty_like(x)
+    assert(allocated(lambda: f(x, out=out)) < MAX_ALLOCATED)
+
+
+def test_tile_coder_batch():
+    x = np.random.uniform(0, 10, size=(4000, 4))
+    out = np.empty((4000, 16), dtype=np.int64)
+    # Nothing proportional to the batch is kept after an unchunked call
+    f = TileCoder(4, 16, 1000)
+    f(x[:10], out=out[:10])
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        f(x, out=out)
+        assert(tracemalloc.get_traced_memory()[0] - start < MAX_ALLOCATED)
+    finally:
+        tracemalloc.stop()
+    assert(np.array_equal(out, f(x)))
+
+    # With chunking, the peak memory depends on the chunk size only, and the
+    # workspace isn't reallocated for the shorter last chunk
+    f = TileCoder(4, 16, 1000, chunk_size=128)
+    chunk_bytes = 128 * 16 * 4 * 8
+    assert(allocated(lambda: f(x, out=out), steps=3) < 8 * chunk_bytes)
+    assert(len(x) % 128 != 0)
+    scratch = f._workspace['chunk_a']
+    assert(np.array_equal(out, f(x)))
+    assert(f._workspace['chunk_a'] is scratch)
+
+
+@pytest.mark.parametrize('f, x, out', [
+    (Int2Bin(16), np.random.randint(0, 2**16, size=(100000, 1)), 
+     np.empty((100000, 1, 16), dtype=np.uint8)),
+    (DropOut(100, 0.3), np.random.uniform(1, 2, size=(2000, 100)),
+     np.empty((2000, 100)))])
+def test_batch_workspaces(f, x, out):
+    # The workspaces are block-sized, however large the batch
+    assert(allocated(lambda: f(x, out=out), steps=3) < MAX_ALLOCATED)
+    kept = sum(a.nbytes for a in f._workspace.values())
+    assert(kept < out.nbytes / 4)
+    f(x[:1], out=out[:1])
+    assert(sum(a.nbytes for a in f._workspace.values()) <= kept)
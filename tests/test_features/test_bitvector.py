@@ -2,6 +2,7 @@ import pytest
 import numpy as np 
 import flib
 from flib import Int2Bin
+from flib.util import unpack_bits
 
 
 def test_Int2Bin():
@@ -14,4 +15,52 @@ def test_Int2Bin():
     output = [func(i) for i in integers]
 
     # over all the integers at once
-    out_array = func(integers)
\ No newline at end of file
+    out_array = func(integers)
+    assert(out_array.shape == (len(integers), length))
+    assert(np.array_equal(out_array, np.array(output)))
+
+
+@pytest.mark.parametrize('length', [1, 10, 64, 70])
+def test_Int2Bin_negative(length):
+    integers = np.arange(-300, 300)
+    func = Int2Bin(min(length, 63))
+    expected = np.array([func(i) for i in integers])
+    assert(np.array_equal(func(integers), expected))
+
+    # Bits beyond the 64th replicate the sign bit
+    func = Int2Bin(length)
+    out_array = func(integers)
+    assert(out_array.shape == (len(integers), length))
+    assert(np.all(out_array[integers < 0, 63:] == 1))
+    assert(np.all(out_array[integers >= 0, 63:] == 0))
+
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16, np.uint32, np.uint64])
+@pytest.mark.parametrize('length', [5, 8, 20, 64, 100])
+def test_Int2Bin_pack(dtype, length):
+    integers = np.random.randint(-2**40, 2**40, size=(100,))
+    func = Int2Bin(length)
+
+    packed = func.pack(integers, dtype=dtype)
+    nbits = 8 * np.dtype(dtype).itemsize
+    assert(packed.dtype == dtype)
+    assert(packed.shape == (len(integers), -(-length // nbits)))
+    assert(np.array_equal(unpack_bits(packed, length), func(integers)))
+
+
+@pytest.mark.parametrize('length', [5, 64, 70])
+def test_Int2Bin_out(length):
+    integers = np.random.randint(-2**40, 2**40, size=(10, 3))
+    func = Int2Bin(length)
+    out = np.empty((10, 3, length), dtype=np.uint8)
+    assert(func(integers, out=out) is out)
+    assert(np.array_equal(out, func(integers)))
+
+
+def test_dtype():
+    assert(Int2Bin(10)(np.arange(5)).dtype == np.uint8)
+    f = Int2Bin(10, dtype=bool)
+    assert(f(np.arange(5)).dtype == bool)
+    assert(np.array_equal(f(np.arange(5)), Int2Bin(10)(np.arange(5))))
+    out = np.empty((5, 10), dtype=bool)
+    assert(np.array_equal(f(np.arange(5), out=out), f(np.arange(5))))
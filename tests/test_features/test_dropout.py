@@ -0,0 +1,49 @@
+"""
+Tests for the dropout features in dropout.py
+"""
+
+import pytest
+import numpy as np 
+from flib import DropOut
+
+
+def test_dropout():
+    f = DropOut(1000, 0.3, random_seed=1)
+    x = np.random.uniform(1, 2, size=(50, 1000))
+    ret = f(x)
+    assert(ret.shape == x.shape)
+    kept = ret != 0
+    assert(np.array_equal(ret[kept], x[kept]))
+    assert(abs(1 - kept.mean() - 0.3) < 0.01)
+    # Rows are dropped independently
+    assert(not np.array_equal(kept[0], kept[1]))
+
+    # Seeded instances draw the same masks
+    assert(np.array_equal(DropOut(1000, 0.3, random_seed=1)(x), ret))
+    assert(not np.array_equal(f(x), ret))
+
+    # In-place
+    y = x.copy()
+    assert(f(y, out=y) is y)
+    assert(abs(np.mean(y == 0) - 0.3) < 0.01)
+    assert(np.array_equal(DropOut(10, 0.0)(x[0, :10]), x[0, :10]))
+    assert(np.all(DropOut(10, 1.0)(x[0, :10]) == 0))
+    with pytest.raises(ValueError):
+        DropOut(10, 1.5)
+
+
+def test_sparse():
+    f = DropOut(2**20, 0.25, random_seed=1)
+    indices = np.random.randint(0, 2**20, size=(200, 32))
+    kept = f.drop(indices[0])
+    assert(set(kept) <= set(indices[0]))
+
+    indptr, kept, data = f.sparse(indices, fmt='triple')
+    assert(len(indptr) == 201)
+    assert(abs(len(kept) / indices.size - 0.75) < 0.02)
+    for i in range(200):
+        assert(set(kept[indptr[i]:indptr[i+1]]) <= set(indices[i]))
+
+    dense = DropOut(100, 0.5, random_seed=2).sparse(np.arange(10), fmt='dense')
+    assert(dense.shape == (1, 100))
+    assert(np.all(dense[0, 10:] == 0))
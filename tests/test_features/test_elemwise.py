@@ -0,0 +1,71 @@
+"""
+Tests for the elementwise features in elemwise.py
+"""
+
+import pytest
+import numpy as np 
+from flib.elemwise import (Add, Ceil, Cut, Floor, Fused, Identity, Mask, 
+                           Multiply, NonZero, Round, Sigmoid, Tanh)
+
+
+CASES = [(Identity(3), lambda x: x),
+         (Sigmoid(3), lambda x: 1 / (1 + np.exp(-x))),
+         (Tanh(3), np.tanh),
+         (Floor(3), np.floor),
+         (Ceil(3), np.ceil),
+         (Round(3, decimals=1), lambda x: np.round(x, 1)),
+         (NonZero(3), lambda x: (x != 0).astype(float)),
+         (Cut(3, -1, 2), lambda x: np.clip(x, -1, 2)),
+         (Cut(3, high=0), lambda x: np.minimum(x, 0)),
+         (Add(3, [1, 2, 3]), lambda x: x + [1, 2, 3]),
+         (Multiply(3, 2.5), lambda x: x * 2.5),
+         (Mask(3, [True, False, True]), lambda x: x * [1, 0, 1])]
+
+
+@pytest.mark.parametrize('f, expected', CASES)
+def test_elementwise(f, expected):
+    x = np.random.normal(scale=3, size=(10, 3))
+    x[0, 0] = 0
+    assert(np.allclose(f(x), expected(x)))
+    assert(np.allclose(f(x[0]), expected(x[0])))
+
+    # In-place operation
+    y = x.copy()
+    assert(f(y, out=y) is y)
+    assert(np.allclose(y, expected(x)))
+
+
+def test_sigmoid_overflow():
+    assert(np.allclose(Sigmoid(3)(np.array([-1e4, 0, 1e4])), [0, 0.5, 1]))
+
+
+def test_fused():
+    ops = [Cut(4, 0, 10), Multiply(4, 0.37), Floor(4)]
+    f = Fused(*ops, block_size=16)
+    assert(len(f.ops) == 3)
+    assert(len(Fused(f, Add(4, 1)).ops) == 4)
+
+    x = np.random.uniform(-5, 15, size=(100, 4))
+    expected = np.floor(np.clip(x, 0, 10) * 0.37)
+    assert(np.allclose(f(x), expected))
+    assert(np.allclose(f(x[0]), expected[0]))
+    assert(np.allclose(f(x.reshape(10, 10, 4)), expected.reshape(10, 10, 4)))
+
+    out = np.empty_like(x)
+    assert(f(x, out=out) is out)
+    assert(np.allclose(out, expected))
+    with pytest.raises(ValueError):
+        Fused(Floor(4), Floor(3))
+
+
+def test_integer_inputs():
+    x = np.array([200, 100], dtype=np.uint8)
+    assert(np.array_equal(Add(2, 100)(x), [300, 200]))
+    assert(np.array_equal(Multiply(2, 2)(x), [400, 200]))
+    assert(np.array_equal(Cut(2, -1, 150)(x), [150, 100]))
+    assert(Add(2, 100)(x).dtype == np.float64)
+
+    # With an explicit dtype, the operation is computed in that dtype
+    ret = Add(2, 100, dtype=np.uint8)(x)
+    assert(ret.dtype == np.uint8)
+    assert(np.array_equal(ret, [44, 200]))
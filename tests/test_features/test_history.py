@@ -0,0 +1,55 @@
+"""
+Tests for the history features in history.py
+"""
+
+import pytest
+import numpy as np 
+from flib.history import History
+
+
+def test_history():
+    f = History(2, 3)
+    assert(len(f) == 6)
+    assert(np.array_equal(f.value(), np.zeros(6)))
+
+    xs = np.arange(20.0).reshape(10, 2)
+    for t, x in enumerate(xs):
+        ret = f(x)
+        expected = np.concatenate([np.zeros((2, 2)), xs[:t+1]])[-3:]
+        assert(np.array_equal(ret, expected.ravel()))
+        assert(np.shares_memory(ret, f._buffer))
+
+    with pytest.raises(ValueError):
+        ret[0] = 1
+    out = np.empty(6)
+    assert(f(xs[0], out=out) is out)
+    assert(np.array_equal(out, np.concatenate([xs[-2:], xs[:1]]).ravel()))
+
+    f.reset()
+    assert(np.array_equal(f.value(), np.zeros(6)))
+
+
+def test_envs():
+    f = History(2, 3, n_envs=4, fill=-1)
+    xs = np.random.uniform(size=(5, 4, 2))
+    for x in xs:
+        ret = f(x)
+    assert(ret.shape == (4, 6))
+    assert(np.array_equal(ret, xs[-3:].transpose(1, 0, 2).reshape(4, 6)))
+
+    reset = np.array([True, False, False, True])
+    ret = f(xs[0], reset=reset)
+    assert(np.array_equal(ret[reset, :4], -np.ones((2, 4))))
+    assert(np.array_equal(ret[reset, 4:], xs[0, reset]))
+    assert(np.array_equal(ret[~reset, :4], xs[-2:, ~reset].transpose(1, 0, 2)
+                          .reshape(2, 4)))
+
+
+def test_sequence():
+    f, g = History(2, 3), History(2, 3)
+    xs = np.random.uniform(size=(5, 2))
+    out = np.empty((5, 6))
+    assert(f(xs, out=out) is out)
+    assert(np.array_equal(out, [g(x).copy() for x in xs]))
+    with pytest.raises(ValueError):
+        f(xs, reset=np.array([True]))
@@ -0,0 +1,95 @@
+"""
+Tests for kanerva.py
+"""
+
+import pytest
+import numpy as np 
+import flib
+from flib.kanerva import KanervaCoder
+
+
+def brute_force(coder, x, prototypes):
+    return np.array([[np.sum(a != b) for b in prototypes] for a in x])
+
+
+@pytest.mark.parametrize('n_input', [10, 64, 100])
+def test_distances(n_input):
+    n_prototypes = 50
+    prototypes = np.random.randint(0, 2, size=(n_prototypes, n_input))
+    inputs = np.random.randint(0, 2, size=(30, n_input))
+    expected = brute_force(None, inputs, prototypes)
+
+    # Small blocks should give the same results as large ones
+    for block_size in (1, 100, 2**22):
+        f = KanervaCoder(n_input, n_prototypes, k=5, prototypes=prototypes, 
+                         block_size=block_size)
+        assert(np.array_equal(f.distances(inputs), expected))
+        assert(np.array_equal(f.distances(f.pack(inputs), packed=True), 
+                              expected))
+
+
+def test_nearest():
+    n_input = 40
+    n_prototypes = 200
+    k = 7
+    f = KanervaCoder(n_input, n_prototypes, k=k, random_seed=1)
+    inputs = np.random.randint(0, 2, size=(100, n_input))
+    dist = f.distances(inputs)
+    nearest = f.nearest(inputs)
+    assert(nearest.shape == (len(inputs), k))
+
+    # The k nearest are no further than any of the others
+    for d, ix in zip(dist, nearest):
+        assert(np.all(np.diff(d[ix]) >= 0))
+        assert(d[ix].max() <= np.delete(d, ix).min())
+
+    out = f(inputs)
+    assert(out.shape == (len(inputs), n_prototypes))
+    assert(np.all(out.sum(axis=1) == k))
+    assert(np.array_equal(f(inputs[0]), out[0]))
+
+
+@pytest.mark.parametrize('k', [1, 7, 300])
+def test_nearest_ties(k):
+    # With few bits, many prototypes are tied, and ties are broken by index
+    f = KanervaCoder(6, 300, k=k, random_seed=2)
+    inputs = np.random.randint(0, 2, size=(200, 6))
+    expected = np.argsort(f.distances(inputs), axis=1, kind='stable')[:, :k]
+    assert(np.array_equal(f.nearest(inputs), expected))
+
+
+def test_within():
+    n_input = 20
+    n_prototypes = 300
+    radius = 7
+    f = KanervaCoder(n_input, n_prototypes, radius=radius, random_seed=1,
+                     block_size=1000)
+    inputs = np.random.randint(0, 2, size=(100, n_input))
+    dist = f.distances(inputs)
+
+    indptr, indices, distances = f.within(inputs)
+    for i, d in enumerate(dist):
+        ix = indices[indptr[i]:indptr[i+1]]
+        assert(np.array_equal(ix, np.flatnonzero(d <= radius)))
+        assert(np.array_equal(distances[indptr[i]:indptr[i+1]], d[ix]))
+
+    assert(np.array_equal(f(inputs), (dist <= radius).astype(float)))
+
+
+def test_init():
+    with pytest.raises(ValueError):
+        KanervaCoder(10, 10)
+    with pytest.raises(ValueError):
+        KanervaCoder(10, 10, k=3, radius=2)
+    with pytest.raises(ValueError):
+        KanervaCoder(10, 10, k=3, prototypes=np.zeros((10, 5)))
+
+
+def test_dtype():
+    x = np.random.randint(0, 2, size=(10, 32))
+    f = KanervaCoder(32, 20, k=3, random_seed=1)
+    assert(f(x).dtype == np.uint8)
+    assert(f.sparse(x, fmt='triple')[2].dtype == np.float64)
+    g = KanervaCoder(32, 20, k=3, random_seed=1, dtype=np.float32)
+    assert(np.array_equal(g(x), f(x)))
+    assert(g(x).dtype == np.float32)
@@ -0,0 +1,99 @@
+"""
+Tests for random_binomial.py
+"""
+
+import pytest
+import numpy as np 
+import flib
+from flib import RandomBinomial
+
+
+def test_output():
+    length = 50
+    num_active = 7
+    keys = np.arange(-500, 500)
+    f = RandomBinomial(length, num_active, random_seed=1)
+
+    out_array = f(keys)
+    assert(out_array.shape == (len(keys), length))
+    assert(np.all(out_array.sum(axis=1) == num_active))
+
+    # Individual outputs agree with batched outputs
+    for key, out in zip(keys[:50], out_array):
+        assert(np.array_equal(f(key), out))
+
+    # Different keys should get different vectors
+    assert(len(np.unique(out_array, axis=0)) > 0.99 * len(keys))
+
+    # Arbitrary hashable keys are supported
+    assert(np.array_equal(f(['a', (1, 2)]), [f('a'), f((1, 2))]))
+
+
+def test_deterministic():
+    keys = np.arange(100)
+    f = RandomBinomial(100, 10, random_seed=123)
+    g = RandomBinomial(100, 10, random_seed=123)
+    h = RandomBinomial(100, 10, random_seed=321)
+    assert(np.array_equal(f.indices(keys), g.indices(keys)))
+    assert(not np.array_equal(f.indices(keys), h.indices(keys)))
+
+
+def test_uniform():
+    length = 20
+    f = RandomBinomial(length, 5, random_seed=1)
+    counts = f(np.arange(20000)).sum(axis=0)
+
+    # More than four standard deviations away is a cause for worry
+    zscore = np.abs(counts - counts.mean())/np.std(counts)
+    assert(np.all(zscore < 4))
+
+
+def test_cache():
+    f = RandomBinomial(100, 10, random_seed=1, cache_size=4)
+    expected = f.indices(np.arange(10))
+    for i in range(10):
+        assert(np.array_equal(f.get_indices(i), expected[i]))
+        assert(len(f._cache) <= 4)
+    assert(len(f._cache) == 4)
+
+    # The cache is consistent for keys that compare equal
+    f = RandomBinomial(100, 10, random_seed=1, cache_size=4)
+    g = RandomBinomial(100, 10, random_seed=1)
+    f.get_indices(1)
+    assert(np.array_equal(f.get_indices(1.0), g.get_indices(1.0)))
+    f.get_indices(2.5)
+    assert(np.array_equal(f.get_indices(np.float64(2.5)), g.get_indices(2.5)))
+
+
+def test_equal_keys():
+    f = RandomBinomial(50, 5, random_seed=1)
+    for a, b in [(1, 1.0), (1, np.int32(1)), (1, np.float64(1.0)), 
+                 (1.5, np.float64(1.5)), (1.5, np.array(1.5)), 
+                 ((1, 2.0), (1.0, 2)), (True, 1)]:
+        assert(np.array_equal(f(a), f(b)))
+    assert(not np.array_equal(f(1), f(1.5)))
+
+    # Batches of shape (N, 1), as passed by pipelines, are batches of scalars
+    keys = np.array([[1.0], [2.5], [-3.0]])
+    assert(np.array_equal(f(keys), [f(1), f(2.5), f(-3)]))
+    assert(np.array_equal(f(np.arange(5).reshape(-1, 1)), f(np.arange(5))))
+
+
+def test_dtype():
+    f = RandomBinomial(50, 5, random_seed=1)
+    assert(f(3).dtype == np.uint8)
+    assert(f([1, 2, 3]).dtype == np.uint8)
+    g = RandomBinomial(50, 5, random_seed=1, dtype=np.float64)
+    assert(np.array_equal(g([1, 2, 3]), f([1, 2, 3])))
+    assert(g([1, 2, 3]).dtype == np.float64)
+
+
+def test_out():
+    f = RandomBinomial(20, 3, random_seed=1)
+    out = np.ones((2, 20), dtype=np.uint8)
+    assert(f([1, 2], out=out) is out)
+    assert(np.array_equal(out, f([1, 2])))
+
+    out = np.full(20, 7.0)
+    assert(f('a', out=out) is out)
+    assert(np.array_equal(out, f('a')))
@@ -0,0 +1,65 @@
+"""
+Tests for rbf.py
+"""
+
+import pytest
+import numpy as np 
+import flib
+from flib import RBF
+
+
+def expected_rbf(x, centers, widths):
+    dist = np.sum((x[:, np.newaxis, :] - centers)**2, axis=-1)
+    return np.exp(-dist / (2 * widths**2))
+
+
+def test_output():
+    n_input = 3
+    n_output = 40
+    centers = np.random.uniform(0, 1, size=(n_output, n_input))
+    widths = np.random.uniform(0.1, 1, size=n_output)
+    inputs = np.random.uniform(0, 1, size=(100, n_input))
+    expected = expected_rbf(inputs, centers, widths)
+
+    for block_size in (1, 100, 2**22):
+        f = RBF(centers, widths, block_size=block_size)
+        assert(np.allclose(f(inputs), expected))
+    assert(np.allclose(f(inputs[0]), expected[0]))
+
+    # Scalar widths are shared by every center
+    f = RBF(centers, 0.5)
+    assert(np.allclose(f(inputs), expected_rbf(inputs, centers, 0.5)))
+
+
+def test_top_k():
+    n_input = 2
+    n_output = 50
+    k = 4
+    centers = np.random.uniform(0, 1, size=(n_output, n_input))
+    inputs = np.random.uniform(0, 1, size=(100, n_input))
+    expected = expected_rbf(inputs, centers, 0.2)
+
+    f = RBF(centers, 0.2, k=k, block_size=100)
+    out = f(inputs)
+    assert(np.all(np.count_nonzero(out, axis=1) == k))
+    for row, exp in zip(out, expected):
+        top = np.sort(exp)[-k:]
+        assert(np.allclose(np.sort(row[row > 0]), top))
+
+    assert(np.allclose(f.sparse(inputs, fmt='dense'), out))
+    indptr, indices, data = f.sparse(inputs, fmt='triple')
+    assert(np.array_equal(indptr, np.arange(len(inputs) + 1) * k))
+
+    with pytest.raises(ValueError):
+        RBF(centers, k=n_output + 1)
+    with pytest.raises(ValueError):
+        RBF(centers).sparse(inputs)
+
+
+def test_dtype():
+    centers = np.random.uniform(0, 10, size=(5, 3))
+    x = np.random.uniform(0, 10, size=(20, 3))
+    f = RBF(centers, 2.0, dtype=np.float32)
+    assert(f(x).dtype == np.float32)
+    assert(np.allclose(f(x), RBF(centers, 2.0)(x), atol=1e-6))
+    assert(RBF(centers, 2.0, k=2, dtype=np.float32)(x).dtype == np.float32)
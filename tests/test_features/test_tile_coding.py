@@ -6,6 +6,7 @@ import pytest
 import numpy as np 
 import flib
 from flib import TileCoder
+from flib.tile_coding import IndexHashTable, MultiplyShiftHash, SimpleHash
 
 
 def test_init():
@@ -72,5 +73,186 @@ def test_randomization():
     zscore = np.abs(hist - hist.mean())/np.std(hist)
     assert(np.all(zscore < 3))
 
+def test_apply_batch():
+    cases = 1000
+    n_input = 4
+    n_output = 16
+    n_tiles = 1000
+    f = TileCoder(n_input, n_output, n_tiles, scale=[1, 2, 0.5, 3])
+
+    low, high = -100, 100
+    inputs = np.random.uniform(low, high, size=(cases, n_input))
+    expected = np.array([f.apply(i) for i in inputs])
+
+    # The batched version should be identical to the per-row version
+    assert(np.array_equal(f.apply_batch(inputs), expected))
+    assert(np.array_equal(f(inputs), expected))
+
+    # Chunking should not affect the result
+    for chunk_size in (1, 7, cases, 2*cases):
+        outputs = f.apply_batch(inputs, chunk_size=chunk_size)
+        assert(np.array_equal(outputs, expected))
+
+    with pytest.raises(ValueError):
+        f.apply_batch(inputs[:, :-1])
+
+def test_sparse():
+    cases = 100
+    n_input = 4
+    n_output = 16
+    n_tiles = 1000
+    f = TileCoder(n_input, n_output, n_tiles)
+
+    low, high = 0, 100
+    inputs = np.random.uniform(low, high, size=(cases, n_input))
+    outputs = f(inputs)
+
+    # Dense representation sums to the number of tilings in each row
+    dense = f.sparse(inputs, fmt='dense')
+    assert(dense.shape == (cases, n_tiles))
+    assert(np.all(dense.sum(axis=1) == n_output))
+    for row, out in zip(dense, outputs):
+        assert(np.all(row[out] > 0))
+
+    # Raw CSR arrays
+    indptr, indices, data = f.sparse(inputs, fmt='triple')
+    assert(np.array_equal(indptr, np.arange(cases + 1) * n_output))
+    assert(np.array_equal(indices, outputs.ravel()))
+    assert(np.all(data == 1))
+
+    # Sparse matrix, if available
+    scipy = pytest.importorskip('scipy')
+    mat = f.sparse(inputs, fmt='csr')
+    assert(mat.shape == (cases, n_tiles))
+    assert(np.array_equal(mat.toarray(), dense))
+
+    # Single inputs are treated as a batch of one
+    assert(f.sparse(inputs[0], fmt='dense').shape == (1, n_tiles))
+
+@pytest.mark.parametrize('hashing', ['table', 'tiled', 'multiply_shift'])
+def test_hashing(hashing):
+    cases = 1000
+    n_input = 4
+    n_output = 16
+    n_tiles = 1000
+    f = TileCoder(n_input, n_output, n_tiles, hashing=hashing, random_seed=1)
+
+    low, high = -100, 100
+    inputs = np.random.uniform(low, high, size=(cases, n_input))
+    outputs = f(inputs)
+    assert(np.all(0 <= outputs))
+    assert(np.all(n_tiles > outputs))
+    assert(np.array_equal(outputs, np.array([f.apply(i) for i in inputs])))
+
+    # Seeding makes the coder reproducible
+    g = TileCoder(n_input, n_output, n_tiles, hashing=hashing, random_seed=1)
+    assert(np.array_equal(outputs, g(inputs)))
+
+
+def test_hash_load():
+    n_input = 2
+    n_output = 8
+    n_tiles = 100
+    table_size = 64
+    hfunc = SimpleHash(table_size, n_tiles, n_tables=n_output, track_load=True)
+    f = TileCoder(n_input, n_output, n_tiles, hashing=hfunc)
+
+    inputs = np.random.uniform(0, 10, size=(50, n_input))
+    f(inputs)
+    assert(hfunc.counts.shape == (n_output, table_size))
+    assert(hfunc.counts.sum() == inputs.size * n_output)
+    assert(0 < hfunc.load <= 1)
+    assert(hfunc.max_load >= 1)
+
+    hfunc.reset_counts()
+    assert(hfunc.load == 0)
+
+    mfunc = MultiplyShiftHash(n_tiles, track_load=True)
+    assert(np.all(mfunc(np.arange(-1000, 1000)) <= n_tiles))
+    assert(mfunc.counts.sum() == 2000)
+
+def test_exact():
+    n_input = 2
+    n_output = 4
+    n_tiles = 10000
+    f = TileCoder(n_input, n_output, n_tiles, hashing='exact')
+
+    inputs = np.random.uniform(0, 10, size=(200, n_input))
+    outputs = f(inputs)
+    assert(np.array_equal(outputs, np.array([f.apply(i) for i in inputs])))
+
+    # Each tiling maps to distinct indices, with no overflow
+    table = f.hfunc
+    assert(table.overflow_count == 0)
+    assert(0 < len(table) <= inputs.size * n_output)
+    assert(len(np.unique(outputs)) == len(table))
+    for i in range(n_output):
+        for j in range(i):
+            assert(not np.intersect1d(outputs[:, i], outputs[:, j]).size)
+
+    # Once full, coordinates are hashed and overflows are counted
+    g = TileCoder(n_input, n_output, 8, hashing='exact')
+    outputs = g(inputs)
+    assert(g.hfunc.full)
+    assert(g.hfunc.overflow_count > 0)
+    assert(np.all((0 <= outputs) & (outputs < 8)))
+
+
+def test_index_hash_table():
+    table = IndexHashTable(100, random_seed=1)
+    coords = np.random.randint(-5, 5, size=(10, 3, 2))
+    ret = table(coords)
+    n = len(table)
+    assert(np.array_equal(np.unique(ret), np.arange(n)))
+    assert(np.array_equal(table(coords), ret))
+
+    # Known coordinates keep their indices, new ones get the unused indices,
+    # and the remainder are hashed once the table is full
+    extra = np.random.randint(100, 10000, size=(40, 3, 2))
+    n_new = len({(i,) + tuple(c) for row in extra for i, c in enumerate(row)})
+    both = table(np.concatenate([coords, extra]))
+    assert(np.array_equal(both[:10], ret))
+    assert(table.full and len(table) == 100)
+    assert(table.overflow_count == n_new - (100 - n))
+    assert(set(range(n, 100)) <= set(both[10:].ravel()))
+    assert(np.all((0 <= both) & (both < 100)))
+
+
+def test_displacement():
+    # Displacements are coprime with the number of tilings
+    for n_tilings in range(4, 64):
+        dvec = TileCoder.get_displacement(8, n_tilings)
+        assert(len(dvec) == 8)
+        assert(np.all(np.gcd(dvec, n_tilings) == 1))
+        assert(np.all(dvec < n_tilings//2))
+
+    # Results are cached and shared between coders
+    f = TileCoder(4, 16, 1000)
+    g = TileCoder(4, 16, 1000)
+    assert(f.dvec is g.dvec)
+    assert(f.dmat is g.dmat)
+    assert(not f.dmat.flags.writeable)
+
+    # Asymmetric displacement uses the odd numbers
+    f = TileCoder(4, 16, 1000, asymmetric=True)
+    assert(np.array_equal(f.dvec, [1, 3, 5, 7]))
+    assert(np.array_equal(f.dmat, np.outer(np.arange(16), [1, 3, 5, 7])))
+
+
+# TODO: test that varying a single element of the input causes appropriate change in output
+
+def test_dtype():
+    x = np.random.uniform(0, 10, size=(20, 4))
+    f = TileCoder(4, 8, 1000, random_seed=1)
+    assert(f.dtype == np.uint16)
+    assert(f(x).dtype == np.uint16)
+    assert(f(x[0]).dtype == np.uint16)
+    assert(TileCoder(4, 8, 256).dtype == np.uint8)
+    assert(TileCoder(4, 8, 10**6).dtype == np.uint32)
+    assert(TileCoder(4, 8, 1000, hashing='exact')(x).dtype == np.uint16)
 
-# TODO: test that varying a single element of the input causes appropriate change in output
\ No newline at end of file
+    g = TileCoder(4, 8, 1000, random_seed=1, dtype=np.int64)
+    assert(np.array_equal(g(x), f(x)))
+    assert(g(x).dtype == np.int64)
+    out = np.empty((20, 8), dtype=np.int32)
+    assert(np.array_equal(f(x, out=out), g(x)))
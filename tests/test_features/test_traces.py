@@ -0,0 +1,110 @@
+"""
+Tests for traces.py
+"""
+
+import pytest
+import numpy as np 
+import flib
+from flib import AccumulatingTrace, ReplacingTrace
+from flib import SparseAccumulatingTrace, SparseReplacingTrace
+
+
+def test_init():
+    with pytest.raises(ValueError):
+        AccumulatingTrace(4, 1.5)
+    with pytest.raises(ValueError):
+        ReplacingTrace(4, -0.5)
+
+
+def test_accumulating():
+    f = AccumulatingTrace(3, 0.5)
+    x = np.array([1, 0, 1])
+    assert(np.allclose(f(x), [1, 0, 1]))
+    assert(np.allclose(f(x), [1.5, 0, 1.5]))
+    assert(np.allclose(f(np.zeros(3)), [0.75, 0, 0.75]))
+
+
+def test_replacing():
+    f = ReplacingTrace(3, 0.5)
+    x = np.array([1, 0, 1])
+    assert(np.allclose(f(x), [1, 0, 1]))
+    assert(np.allclose(f(x), [1, 0, 1]))
+    assert(np.allclose(f(np.zeros(3)), [0.5, 0, 0.5]))
+
+
+@pytest.mark.parametrize('cls', [AccumulatingTrace, ReplacingTrace])
+def test_batched(cls):
+    n_envs = 8
+    n_input = 5
+    steps = 20
+    inputs = np.random.binomial(1, 0.3, size=(steps, n_envs, n_input))
+    resets = np.random.binomial(1, 0.2, size=(steps, n_envs)).astype(bool)
+
+    # Batched trace should match a separate trace for each environment
+    batched = cls(n_input, 0.9, n_envs=n_envs)
+    single = [cls(n_input, 0.9) for i in range(n_envs)]
+    out = np.empty((n_envs, n_input))
+    for x, reset in zip(inputs, resets):
+        ret = batched(x, reset=reset, out=out)
+        assert(ret is out)
+        for i, f in enumerate(single):
+            if reset[i]:
+                f.reset()
+            assert(np.allclose(f(x[i]), out[i]))
+
+    batched.reset()
+    assert(np.all(batched._array == 0))
+
+
+@pytest.mark.parametrize('dense_cls, sparse_cls', [
+    (AccumulatingTrace, SparseAccumulatingTrace),
+    (ReplacingTrace, SparseReplacingTrace),
+])
+def test_sparse(dense_cls, sparse_cls):
+    n_input = 1000
+    n_active = 8
+    steps = 500
+    threshold = 1e-6
+    dense = dense_cls(n_input, 0.8)
+    sparse = sparse_cls(n_input, 0.8, threshold=threshold, min_scale=1e-3)
+
+    for i in range(steps):
+        indices = np.random.randint(0, n_input, size=n_active)
+        x = np.zeros(n_input)
+        x[indices] = 1
+        expected = dense(x)
+        live, values = sparse(indices)
+
+        # Values agree up to those dropped for falling below the threshold
+        assert(np.allclose(sparse.todense(), expected, atol=threshold))
+        assert(np.allclose(values, expected[live], atol=threshold))
+        assert(np.allclose(sparse.value(indices), expected[indices]))
+
+        # The live indices are distinct, and include every nonzero entry
+        assert(len(np.unique(live)) == len(live))
+        assert(np.all(np.isin(np.flatnonzero(sparse.todense()), live)))
+
+    # Small entries are dropped from the live indices
+    assert(len(sparse.live_indices()) < n_input)
+
+    sparse.reset()
+    assert(np.all(sparse.todense() == 0))
+    assert(len(sparse.live_indices()) == 0)
+
+
+@pytest.mark.parametrize('cls', [AccumulatingTrace, ReplacingTrace])
+def test_sequence(cls):
+    inputs = np.random.binomial(1, 0.3, size=(10, 4))
+    f, g = cls(4, 0.9), cls(4, 0.9)
+    out = np.empty((10, 4))
+    assert(f(inputs, out=out) is out)
+    assert(np.allclose(out, [g(x).copy() for x in inputs]))
+    with pytest.raises(ValueError):
+        f(inputs, reset=True)
+
+    # Sequences of steps for multiple environments
+    inputs = np.random.binomial(1, 0.3, size=(10, 3, 4))
+    f, g = cls(4, 0.9, n_envs=3), cls(4, 0.9, n_envs=3)
+    out = np.empty((10, 3, 4))
+    assert(f(inputs, out=out) is out)
+    assert(np.allclose(out, [g(x).copy() for x in inputs]))
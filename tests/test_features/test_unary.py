@@ -0,0 +1,59 @@
+"""
+Tests for int2unary.py
+"""
+
+import pytest
+import numpy as np 
+import flib
+from flib import Int2Unary
+
+
+def test_Int2Unary():
+    length = 10
+    integers = np.arange(length)
+    func = Int2Unary(length)
+
+    # individual outputs
+    for i in integers:
+        out = func(i)
+        assert(out.shape == (length,))
+        assert(out[i] == 1)
+        assert(out.sum() == 1)
+
+    # over all the integers at once
+    out_array = func(integers)
+    assert(np.array_equal(out_array, np.eye(length)))
+
+
+def test_Int2Unary_sparse():
+    length = 10
+    integers = np.array([3, 1, 4, 1, 5, 9, 2, 6])
+    func = Int2Unary(length)
+
+    assert(np.array_equal(func.sparse(integers, fmt='dense'), func(integers)))
+
+    indptr, indices, data = func.sparse(integers, fmt='triple')
+    assert(np.array_equal(indptr, np.arange(len(integers) + 1)))
+    assert(np.array_equal(indices, integers))
+
+
+def test_Int2Unary_out():
+    length = 10
+    integers = np.array([[3, 1], [4, 1], [5, 9]])
+    func = Int2Unary(length)
+
+    out = np.full(integers.shape + (length,), 7.0)
+    ret = func(integers, out=out)
+    assert(ret is out)
+    assert(np.array_equal(out, np.eye(length)[integers]))
+
+    with pytest.raises(ValueError):
+        func(integers, out=np.empty((3, length)))
+    with pytest.raises(IndexError):
+        func(length)
+
+
+def test_dtype():
+    assert(Int2Unary(10)(3).dtype == np.uint8)
+    assert(Int2Unary(10)([1, 2]).dtype == np.uint8)
+    assert(Int2Unary(10, dtype=np.float32)(3).dtype == np.float32)
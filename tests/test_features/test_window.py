@@ -0,0 +1,94 @@
+"""
+Tests for the window features in window.py
+"""
+
+import pytest
+import numpy as np 
+from flib.window import (ExponentialMean, ExponentialVariance, WindowMax, 
+                         WindowMean, WindowMin, WindowSum, WindowVariance, 
+                         sliding_max, sliding_mean, sliding_min, sliding_sum,
+                         sliding_variance)
+
+
+def brute_force(func, x, length):
+    return np.array([func(x[max(0, t-length+1):t+1], axis=0) 
+                     for t in range(len(x))])
+
+
+CASES = [(WindowSum, sliding_sum, np.sum),
+         (WindowMean, sliding_mean, np.mean),
+         (WindowVariance, sliding_variance, np.var),
+         (WindowMin, sliding_min, np.min),
+         (WindowMax, sliding_max, np.max)]
+
+
+@pytest.mark.parametrize('cls, sliding, func', CASES)
+@pytest.mark.parametrize('length', [1, 3, 8])
+def test_window(cls, sliding, func, length):
+    x = np.random.normal(size=(50, 4))
+    expected = brute_force(func, x, length)
+    assert(np.allclose(sliding(x, length), expected))
+
+    # Stepping through the inputs one at a time
+    f = cls(4, length)
+    ret = np.array([f(row).copy() for row in x])
+    assert(np.allclose(ret, expected))
+
+    # Sequences continue from the current state
+    f = cls(4, length)
+    ret = np.concatenate([f(x[:5]), f(x[5:6]), f(x[6:37]), 
+                          [f(row).copy() for row in x[37:]]])
+    assert(np.allclose(ret, expected))
+
+    f.reset()
+    assert(np.allclose(f(x[:10]), expected[:10]))
+
+
+@pytest.mark.parametrize('cls, sliding, func', CASES)
+def test_envs(cls, sliding, func):
+    length = 4
+    x = np.random.normal(size=(20, 3, 2))
+    f = cls(2, length, n_envs=3)
+    ret = np.array([f(row).copy() for row in x[:10]])
+    assert(np.allclose(ret, sliding(x[:10], length)))
+
+    # Resetting an environment restarts its window
+    reset = np.array([False, True, False])
+    ret = np.array([f(x[10], reset=reset).copy()] + 
+                   [f(row).copy() for row in x[11:]])
+    assert(np.allclose(ret[:, ~reset], sliding(x, length)[10:, ~reset]))
+    assert(np.allclose(ret[:, reset], sliding(x[10:, reset], length)))
+    assert(np.allclose(f(x[:5]), sliding(np.concatenate([x, x[:5]]), 
+                                         length)[-5:]))
+
+
+def test_exponential():
+    decay = 0.8
+    x = np.random.normal(size=(30, 3))
+    mean, var = ExponentialMean(3, decay), ExponentialVariance(3, decay)
+    for t in range(len(x)):
+        weights = decay**np.arange(t, -1, -1)[:, np.newaxis]
+        m = np.sum(weights * x[:t+1], axis=0) / np.sum(weights)
+        v = np.sum(weights * (x[:t+1] - m)**2, axis=0) / np.sum(weights)
+        assert(np.allclose(mean(x[t]), m))
+        assert(np.allclose(var(x[t]), v))
+
+    f = ExponentialMean(3, decay, n_envs=2)
+    f(x[:2])
+    ret = f(x[2:4], reset=np.array([True, False]))
+    assert(np.allclose(ret[0], x[2]))
+    with pytest.raises(ValueError):
+        ExponentialMean(3, 1.0)
+
+
+def test_exponential_sequence():
+    x = np.random.normal(size=(10, 2, 3))
+    f = ExponentialVariance(3, 0.5, n_envs=2)
+    g = ExponentialVariance(3, 0.5, n_envs=2)
+    out = np.empty((10, 2, 3))
+    assert(f(x, out=out) is out)
+    assert(np.allclose(out, [g(row).copy() for row in x]))
+    with pytest.raises(ValueError):
+        f(x, reset=np.array([True, False]))
+    with pytest.raises(ValueError):
+        WindowSum(3, 4, n_envs=2)(x, reset=np.array([True, False]))
@@ -0,0 +1,83 @@
+"""
+Tests for the features in misc.py
+"""
+
+import pytest
+import numpy as np 
+from flib import Int2Bin, Int2Unary, RBF, TileCoder
+from flib.abstract import FunctionalFeature
+from flib.misc import Combiner, Repeater, Splitter
+
+
+def test_repeater():
+    f = Repeater(3, 4)
+    assert(len(f) == 12)
+    x = np.arange(6.0).reshape(2, 3)
+    ret = f(x)
+    assert(ret.shape == (2, 4, 3))
+    assert(np.shares_memory(ret, x))
+    assert(np.array_equal(ret.reshape(2, -1), np.tile(x, 4)))
+
+    out = np.empty((2, 12))
+    assert(f(x, out=out) is out)
+    assert(np.array_equal(out, np.tile(x, 4)))
+
+
+def test_splitter():
+    x = np.arange(24.0).reshape(4, 6)
+    a, b, c = Splitter(6, [1, 2, 3])(x)
+    assert(np.array_equal(b, x[:, 1:3]))
+    assert(all(np.shares_memory(i, x) for i in (a, b, c)))
+    assert(len(Splitter(6, 3)(x[0])) == 3)
+    with pytest.raises(ValueError):
+        Splitter(6, 4)
+    with pytest.raises(ValueError):
+        Splitter(6, [1, 2])
+
+
+def test_combiner():
+    features = [TileCoder(2, 4, 100, random_seed=1), 
+                RBF(np.random.uniform(0, 10, size=(5, 2)), 2.0),
+                FunctionalFeature(2, 2, func=lambda x: x + 1)]
+    f = Combiner(features)
+    assert(len(f) == 11)
+    x = np.random.uniform(0, 10, size=(20, 2))
+    expected = np.concatenate([g(x) for g in features], axis=1)
+    assert(np.allclose(f(x), expected))
+    assert(np.allclose(f(x[0]), expected[0]))
+
+    out = np.empty((20, 11))
+    assert(f(x, out=out) is out)
+    assert(np.allclose(out, expected))
+    with pytest.raises(ValueError):
+        Combiner([TileCoder(2, 4, 100), TileCoder(3, 4, 100)])
+
+
+def test_combiner_scalar_inputs():
+    x = np.arange(5).reshape(5, 1)
+    for features in [[Int2Unary(8), Int2Bin(3)], [Int2Bin(4), Int2Bin(3)],
+                     [Int2Bin(4), TileCoder(1, 4, 100, random_seed=1)]]:
+        f = Combiner(features)
+        expected = np.concatenate([np.reshape(g(x), (5, -1)) 
+                                   for g in features], axis=1)
+        assert(np.array_equal(f(x), expected))
+        out = np.empty((5, f.n_output))
+        assert(f(x, out=out) is out)
+        assert(np.array_equal(out, expected))
+        assert(np.array_equal(f(x[0]), expected[0]))
+
+
+def test_combiner_dtype():
+    assert(Combiner([TileCoder(2, 4, 100), TileCoder(2, 4, 1000)]).dtype 
+           == np.uint16)
+    assert(Combiner([Int2Bin(4), Int2Unary(3)]).dtype == np.uint8)
+    assert(Combiner([TileCoder(2, 4, 100), 
+                     FunctionalFeature(2, 2, func=lambda x: x)]).dtype 
+           == np.float64)
+    assert(Combiner([Int2Bin(4)], dtype=np.float32).dtype == np.float32)
+
+
+def test_splitter_pipeline():
+    from flib.flib import chain, source
+    with pytest.raises(TypeError):
+        chain(source(4), Splitter(4, 2))
@@ -0,0 +1,61 @@
+"""
+Tests for norm.py
+"""
+
+import pytest
+import numpy as np 
+from flib.norm import (hamming_distance, l1_norm, l2_norm, lp_norm, 
+                       pairwise_distance)
+
+
+def test_axis():
+    x = np.random.normal(size=(20, 5))
+    assert(np.allclose(l1_norm(x, axis=1), [l1_norm(i) for i in x]))
+    assert(np.allclose(l2_norm(x, axis=1), np.linalg.norm(x, axis=1)))
+    assert(np.allclose(lp_norm(x, 3, axis=0), [lp_norm(i, 3) for i in x.T]))
+    assert(np.isscalar(l2_norm(x)))
+
+
+@pytest.mark.parametrize('metric, p', [
+    ('l1', None), ('l2', None), ('lp', 3), ('hamming', None)
+])
+@pytest.mark.parametrize('block_size', [1, 50, 2**22])
+def test_pairwise(metric, p, block_size):
+    if metric == 'hamming':
+        a = np.random.randint(0, 3, size=(30, 8))
+        b = np.random.randint(0, 3, size=(20, 8))
+    else:
+        a = np.random.normal(size=(30, 8))
+        b = np.random.normal(size=(20, 8))
+
+    diff = a[:, np.newaxis, :] - b
+    expected = {
+        'l1': l1_norm(diff, axis=-1),
+        'l2': l2_norm(diff, axis=-1),
+        'lp': lp_norm(diff, 3, axis=-1),
+        'hamming': hamming_distance(a[:, np.newaxis, :], b, axis=-1),
+    }[metric]
+    dist = pairwise_distance(a, b, metric=metric, p=p, block_size=block_size)
+    assert(dist.shape == (len(a), len(b)))
+    assert(np.allclose(dist, expected))
+
+
+def test_pairwise_special():
+    a = np.random.normal(size=(30, 8))
+    b = np.random.normal(size=(20, 8))
+    sq = pairwise_distance(a, b, squared=True)
+    assert(np.allclose(sq, pairwise_distance(a, b)**2))
+
+    out = np.empty((30, 20))
+    assert(pairwise_distance(a, b, out=out) is out)
+
+    # Boolean arrays use the matrix-product form of the Hamming distance
+    a = np.random.randint(0, 2, size=(30, 8)).astype(bool)
+    b = np.random.randint(0, 2, size=(20, 8)).astype(bool)
+    expected = np.sum(a[:, np.newaxis, :] != b, axis=-1)
+    assert(np.array_equal(pairwise_distance(a, b, metric='hamming'), expected))
+
+    with pytest.raises(ValueError):
+        pairwise_distance(a, b[:, :-1])
+    with pytest.raises(ValueError):
+        pairwise_distance(a, b, metric='lp')
@@ -0,0 +1,176 @@
+"""
+Tests for the pipelines in flib.py
+"""
+
+import pytest
+import numpy as np 
+from flib import AccumulatingTrace, DropOut, Int2Bin, RBF, TileCoder
+from flib.abstract import FunctionalFeature
+from flib.flib import (Apply, Concat, Pipeline, Source, accepts_out, chain, 
+                       concat, source, tee)
+
+
+def test_shapes():
+    src = source(4)
+    a, b = tee(src, TileCoder(4, 8, 100), TileCoder(4, 16, 100))
+    node = concat(a, b)
+    assert(node.n_output == 24)
+
+    pipeline = Pipeline(node)
+    assert(pipeline.n_input == 4)
+    assert(pipeline.n_output == 24)
+    assert(len(pipeline.nodes) == 4)
+
+    with pytest.raises(ValueError):
+        chain(src, TileCoder(3, 8, 100))
+    with pytest.raises(ValueError):
+        Pipeline(concat(source(4), source(4)))
+
+
+def test_output():
+    f = TileCoder(4, 8, 100, random_seed=1)
+    g = RBF(np.random.uniform(0, 10, size=(5, 4)), 2.0)
+    src = source(4)
+    pipeline = Pipeline(concat(*tee(src, f, g)))
+
+    x = np.random.uniform(0, 10, size=(20, 4))
+    expected = np.concatenate([f(x), g(x)], axis=1)
+    assert(np.allclose(pipeline(x), expected))
+
+    # Buffers are reused after the first call
+    first = pipeline(x)
+    assert(np.shares_memory(first, pipeline(x)))
+    assert(np.allclose(pipeline(x[:3]), expected[:3]))
+    assert(np.allclose(pipeline(x[0]), expected[0]))
+
+
+def test_chain():
+    func = FunctionalFeature(1, 1, func=lambda x: np.asarray(x).ravel() % 7)
+    func.vectorized = True
+    pipeline = Pipeline(chain(source(1), func, Int2Bin(3)))
+    x = np.arange(20).reshape(-1, 1)
+    assert(np.array_equal(pipeline(x), Int2Bin(3)((x % 7).ravel())))
+
+
+def test_replace():
+    src = source(4)
+    a = Apply(TileCoder(4, 8, 100), src)
+    b = Apply(TileCoder(4, 4, 100), src)
+    pipeline = Pipeline(concat(a, b))
+    x = np.random.uniform(0, 10, size=(20, 4))
+    pipeline(x)
+    pipeline(x)
+
+    f = TileCoder(4, 16, 100)
+    pipeline.replace(a, f)
+    assert(pipeline.n_output == 20)
+    out = pipeline(x)
+    assert(np.array_equal(out[:, :16], f(x)))
+
+    # Incompatible replacements leave the pipeline unchanged
+    with pytest.raises(ValueError):
+        pipeline.replace(a, TileCoder(3, 8, 100))
+    assert(a.feature is f)
+    with pytest.raises(TypeError):
+        pipeline.replace(src, f)
+
+
+def test_accepts_out():
+    assert(accepts_out(TileCoder(4, 8, 100)))
+    assert(accepts_out(AccumulatingTrace(4, 0.5)))
+    assert(accepts_out(DropOut(4, 0.5)))
+    assert(accepts_out(FunctionalFeature(4, 4, func=np.tanh)))
+    assert(not accepts_out(FunctionalFeature(4, 4, func=lambda x: x + 1)))
+    assert(not accepts_out(np.tanh))
+
+
+def test_merge():
+    src = source(4)
+    f = TileCoder(4, 8, 100, random_seed=1)
+    # Separately constructed nodes computing the same thing are merged
+    a = concat(Apply(f, src), Apply(TileCoder(4, 4, 100), src))
+    b = concat(Apply(f, src), Apply(f, src))
+    pipeline = Pipeline(concat(a, b, concat(Apply(f, src), Apply(f, src))))
+    assert(len(pipeline.nodes) == 6)
+
+    x = np.random.uniform(0, 10, size=(20, 4))
+    out = pipeline(x)
+    assert(np.array_equal(out[:, :8], f(x)))
+    assert(np.array_equal(out[:, 12:20], f(x)))
+    assert(np.array_equal(out[:, 12:28], out[:, 28:]))
+
+    # Replacing a merged node replaces the node standing in for it
+    g = TileCoder(4, 2, 100)
+    pipeline.replace(b.inputs[1], g)
+    assert(pipeline.n_output == 14)
+    assert(np.array_equal(pipeline(x)[:, :2], g(x)))
+
+
+def test_memoize():
+    trace = AccumulatingTrace(3, 0.5)
+    src = source(3)
+    shared = Apply(trace, src)
+    heads = [Pipeline(chain(shared, FunctionalFeature(3, 3, func=np.negative))),
+             Pipeline(concat(shared, shared))]
+
+    # The trace advances once per step, however many heads consume it
+    x = np.ones((1, 3))
+    for t in range(3):
+        first, second = [head(x, step=t) for head in heads]
+        expected = sum(0.5**i for i in range(t + 1))
+        assert(np.allclose(first, -expected))
+        assert(np.allclose(second, expected))
+
+    # Without a step token, every call starts a new step
+    heads[1](x)
+    heads[1](x)
+    assert(np.allclose(trace._array, 0.25*1.75 + 1.5))
+
+
+def test_fusion():
+    from flib.elemwise import Cut, Floor, Multiply, Tanh
+
+    src = source(4)
+    clip, scale = Cut(4, 0, 10), Multiply(4, 0.5)
+    scaled = chain(src, clip, scale)
+    tiles = Apply(TileCoder(4, 8, 100, random_seed=1), chain(scaled, Floor(4)))
+    pipeline = Pipeline(concat(tiles, Apply(Tanh(4), scaled)))
+
+    # Only the intermediate results used once are skipped
+    skipped = {pipeline.nodes[i].feature for i in pipeline._skip}
+    assert(skipped == {clip})
+    x = np.random.uniform(-5, 15, size=(20, 4))
+    scaled_x = np.clip(x, 0, 10) * 0.5
+    values = pipeline.run(x)
+    assert(values[1] is None)
+    assert(np.allclose(pipeline(x)[:, 8:], np.tanh(scaled_x)))
+    assert(np.array_equal(pipeline(x)[:, :8], 
+                          TileCoder(4, 8, 100, random_seed=1)(
+                              np.floor(scaled_x))))
+
+    # Replacing a fused feature updates the fused chain
+    pipeline.replace(scaled, Multiply(4, 0.25))
+    assert(np.allclose(pipeline(x)[:, 8:], np.tanh(scaled_x / 2)))
+
+
+@pytest.mark.parametrize('x', [
+    np.random.randint(0, 256, size=(20, 2)).astype(np.uint8),
+    np.random.randint(-50, 50, size=(20, 2)),
+    np.random.uniform(-5, 5, size=(20, 2))])
+def test_fusion_dtypes(x):
+    from flib.elemwise import (Add, Cut, Floor, Identity, Multiply, NonZero, 
+                               Round)
+    chains = [[Floor(2), NonZero(2, dtype=bool)],
+              [Identity(2), Add(2, 100)],
+              [Round(2), Multiply(2, 3, dtype=np.int16), Cut(2, -100, 300)],
+              [Identity(2), Add(2, 100, dtype=np.uint8), Identity(2)],
+              [Cut(2, 0, 10, dtype=np.int64), Multiply(2, 0.5)]]
+    for features in chains:
+        pipeline = Pipeline(chain(source(2), *features))
+        assert(len(pipeline._fusion) == 1)
+        expected = x
+        for f in features:
+            expected = f(expected)
+        ret = pipeline(x)
+        assert(ret.dtype == expected.dtype)
+        assert(np.array_equal(ret, expected))
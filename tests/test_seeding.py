@@ -0,0 +1,97 @@
+"""
+Tests for the seeding functions in seeding.py
+"""
+
+import numpy as np 
+from flib import DropOut, RandomBinomial, TileCoder
+from flib.kanerva import KanervaCoder
+from flib.seeding import default_rng, seed_sequence, spawn
+
+
+def test_seed_sequence():
+    ss = np.random.SeedSequence(5)
+    assert(seed_sequence(ss) is ss)
+    assert(seed_sequence(5).entropy == 5)
+    assert(seed_sequence(np.random.default_rng(ss)) is ss)
+    # Legacy generators are used to seed a new sequence
+    a = seed_sequence(np.random.RandomState(1))
+    assert(np.array_equal(a.entropy, 
+                          seed_sequence(np.random.RandomState(1)).entropy))
+
+    rng = np.random.default_rng(1)
+    assert(default_rng(rng) is rng)
+    assert(default_rng(3).random() == default_rng(3).random())
+
+
+def test_spawn():
+    a, b = spawn(7, 2)
+    c, d = spawn(7, 2)
+    assert(a.spawn_key == c.spawn_key)
+    assert(a.spawn_key != b.spawn_key)
+    assert(default_rng(a).random() == default_rng(c).random())
+    assert(default_rng(a).random() != default_rng(b).random())
+
+    # Spawning repeatedly from a sequence gives new children each time
+    ss = np.random.SeedSequence(7)
+    assert(ss.spawn(1)[0].spawn_key != ss.spawn(1)[0].spawn_key)
+
+
+def test_features():
+    x = np.random.uniform(0, 10, size=(20, 4))
+    for seed in [1, np.random.SeedSequence(1)]:
+        assert(np.array_equal(TileCoder(4, 8, 1024, random_seed=seed)(x), 
+                              TileCoder(4, 8, 1024, random_seed=1)(x)))
+    # Independent streams give independent features
+    a, b = spawn(1, 2)
+    assert(not np.array_equal(TileCoder(4, 8, 1024, random_seed=a)(x), 
+                              TileCoder(4, 8, 1024, random_seed=b)(x)))
+
+    assert(np.array_equal(RandomBinomial(100, 5, random_seed=a)([1, 2, 3]),
+                          RandomBinomial(100, 5, random_seed=a)([1, 2, 3])))
+    assert(np.array_equal(KanervaCoder(16, 10, k=2, random_seed=a).prototypes,
+                          KanervaCoder(16, 10, k=2, random_seed=a).prototypes))
+    assert(np.array_equal(DropOut(10, 0.5, random_seed=a)(np.ones(10)), 
+                          DropOut(10, 0.5, random_seed=a)(np.ones(10))))
+
+
+def test_reseed():
+    x = np.random.uniform(0, 10, size=(20, 4))
+    f = TileCoder(4, 8, 1024, random_seed=2)
+    assert(f.seed(1) is None)
+    assert(np.array_equal(f(x), TileCoder(4, 8, 1024, random_seed=1)(x)))
+
+    g = RandomBinomial(100, 5, random_seed=2, cache_size=4)
+    g.get_indices(1)
+    g.seed(1)
+    assert(np.array_equal(g.get_indices(1), 
+                          RandomBinomial(100, 5, random_seed=1).get_indices(1)))
+    k = KanervaCoder(16, 10, k=2, random_seed=2)
+    k.seed(1)
+    assert(np.array_equal(k.prototypes, 
+                          KanervaCoder(16, 10, k=2, random_seed=1).prototypes))
+    # Given prototypes are kept
+    k = KanervaCoder(16, 10, k=2, prototypes=np.eye(10, 16))
+    k.seed(1)
+    assert(np.array_equal(k.prototypes, 
+                          KanervaCoder(16, 10, k=2, 
+                                       prototypes=np.eye(10, 16)).prototypes))
+
+
+def test_pipeline():
+    from flib.flib import Pipeline, concat, source, tee
+    x = np.random.uniform(0, 10, size=(20, 4))
+
+    def build(a=None, b=None, random_seed=None):
+        heads = tee(source(4), TileCoder(4, 8, 1024, random_seed=a), 
+                    TileCoder(4, 4, 1024, random_seed=b))
+        return Pipeline(concat(*heads), random_seed=random_seed)
+
+    # Each feature is seeded with a child of the pipeline's seed
+    expected = build(*spawn(5, 2))(x).copy()
+    assert(np.array_equal(build(random_seed=5)(x), expected))
+    assert(np.array_equal(build(1, 2, random_seed=5)(x), expected))
+    assert(not np.array_equal(build(random_seed=6)(x), expected))
+
+    pipeline = build(random_seed=6)
+    pipeline.seed(5)
+    assert(np.array_equal(pipeline(x), expected))
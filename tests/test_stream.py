@@ -0,0 +1,58 @@
+"""
+Tests for the streaming functions in stream.py
+"""
+
+import pytest
+import numpy as np 
+from flib import TileCoder
+from flib.flib import Pipeline, chain, source
+from flib.stream import background, batches, stream
+
+
+def observations(n):
+    rng = np.random.RandomState(0)
+    for _ in range(n):
+        yield rng.uniform(0, 10, size=4)
+
+
+def test_batches():
+    ret = list(batches(range(10), 4))
+    assert([len(b) for b in ret] == [4, 4, 2])
+    assert(ret[0].shape == (4, 1))
+    assert(np.array_equal(np.concatenate(ret).ravel(), np.arange(10)))
+    with pytest.raises(ValueError):
+        next(batches(range(10), 0))
+
+
+def test_background():
+    assert(list(background(range(100), 3)) == list(range(100)))
+
+    def failing():
+        yield 1
+        raise RuntimeError("failed")
+
+    it = background(failing(), 1)
+    assert(next(it) == 1)
+    with pytest.raises(RuntimeError):
+        next(it)
+
+    # Closing the generator early stops the thread
+    it = background(iter(range(10**9)), 2)
+    next(it)
+    it.close()
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_stream(prefetch):
+    f = TileCoder(4, 8, 100, random_seed=1)
+    x = np.array(list(observations(50)))
+    expected = f(x)
+
+    ret = list(stream(f, observations(50), batch_size=16, prefetch=prefetch))
+    assert([len(r) for r in ret] == [16, 16, 16, 2])
+    assert(np.array_equal(np.concatenate(ret), expected))
+
+    pipeline = Pipeline(chain(source(4), f))
+    ret = [r.copy() for r in stream(pipeline, observations(50), batch_size=16, 
+                                    prefetch=prefetch, flatten=True)]
+    assert(np.array_equal(ret, expected))